@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Case, Child, FosterFamily, FosterPlacement, HealthService, ReminderLog
+from .models import Case, Child, FosterFamily, FosterPlacement, HealthService, NotificationOutbox, ReminderLog
 
 
 class CaseInline(admin.TabularInline):
@@ -35,4 +35,9 @@ class HealthServiceAdmin(admin.ModelAdmin):
 
 @admin.register(ReminderLog)
 class ReminderLogAdmin(admin.ModelAdmin):
-	list_display = ('user', 'service', 'sent_date', 'status')
\ No newline at end of file
+	list_display = ('user', 'service', 'sent_date', 'status')
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+	list_display = ('recipient', 'subject', 'digest_date', 'status', 'attempts', 'sent_date')
+	list_filter = ('status', 'digest_date')
@@ -5,3 +5,5 @@ class C2cConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'c2c'
 
+    def ready(self):
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from .cache import get_group_permissions, tokens_revoked
+
+
+class RoleTokenUser(TokenUser):
+	# Request user built from the signed role and group claims, with the groups'
+	# model permissions, so read requests never load the User row.
+
+	@property
+	def role(self):
+		return self.token.get('role')
+
+	def get_group_permissions(self, obj=None):
+		return get_group_permissions(self.token.get('groups', []))
+
+	def get_all_permissions(self, obj=None):
+		return self.get_group_permissions(obj)
+
+	def has_perm(self, perm, obj=None):
+		return self.is_active and perm in self.get_all_permissions(obj)
+
+	def has_perms(self, perm_list, obj=None):
+		permissions = self.get_all_permissions(obj)
+		return self.is_active and all(perm in permissions for perm in perm_list)
+
+
+class RoleClaimsJWTAuthentication(JWTAuthentication):
+	# Safe-method requests are served from the token's claims alone. Writes
+	# still load the user, as serializers and model code expect a real User.
+	# Tokens issued before c2c.signals revoked them are rejected either way.
+
+	def authenticate(self, request):
+		self.stateless = request.method in SAFE_METHODS
+		return super().authenticate(request)
+
+	def get_user(self, validated_token):
+		if settings.ACCESS_TOKEN_REVOCATION and tokens_revoked(
+			validated_token.get(api_settings.USER_ID_CLAIM), validated_token.get('auth_time', 0)
+		):
+			raise InvalidToken(_('Token has been revoked'))
+
+		if self.stateless and 'role' in validated_token:
+			if api_settings.USER_ID_CLAIM not in validated_token:
+				raise InvalidToken(_('Token contained no recognizable user identification'))
+			return RoleTokenUser(validated_token)
+		return super().get_user(validated_token)
@@ -0,0 +1,94 @@
+import hashlib
+import time
+import uuid
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from django.core.cache import cache, caches
+from django.db import transaction
+
+
+def _access_key(user_id):
+	return f'c2c:access:{user_id}'
+
+def get_cached_access(user_id):
+	return cache.get(_access_key(user_id))
+
+def set_cached_access(user_id, role, child_ids):
+	cache.set(_access_key(user_id), (role, frozenset(child_ids)), settings.ACCESS_SCOPE_CACHE_TIMEOUT)
+
+def invalidate_access(user_ids):
+	keys = [_access_key(user_id) for user_id in set(user_ids) if user_id is not None]
+	if not keys:
+		return
+	# Drop now so the writing request sees its own change, and again on commit
+	# in case a concurrent request re-cached the pre-commit scope meanwhile.
+	cache.delete_many(keys)
+	transaction.on_commit(lambda: cache.delete_many(keys))
+
+def _group_permissions_key(group_name):
+	return f'c2c:group-perms:{group_name}'
+
+def get_group_permissions(group_names):
+	# 'app_label.codename' strings granted by the named groups, as ModelBackend
+	# would report them, for users authenticated from token claims alone.
+	keys = {name: _group_permissions_key(name) for name in group_names}
+	found = cache.get_many(keys.values())
+	missing = [name for name, key in keys.items() if key not in found]
+	if missing:
+		loaded = {keys[name]: set() for name in missing}
+		rows = Permission.objects.filter(group__name__in=missing).values_list('group__name', 'content_type__app_label', 'codename')
+		for group_name, app_label, codename in rows:
+			loaded[keys[group_name]].add(f'{app_label}.{codename}')
+		cache.set_many(loaded, settings.ACCESS_SCOPE_CACHE_TIMEOUT)
+		found.update(loaded)
+	return set().union(*found.values())
+
+def invalidate_group_permissions(group_names):
+	cache.delete_many([_group_permissions_key(name) for name in group_names])
+
+
+def _revoked_key(user_id):
+	return f'c2c:tokens-revoked:{user_id}'
+
+def revoke_tokens(user_ids):
+	# Access tokens issued before now stop authenticating. Refresh tokens still
+	# work, reissuing claims from the user's current groups. Entries only need
+	# to outlive the access tokens they reject.
+	revoked_at = time.time()
+	timeout = settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'].total_seconds()
+	cache.set_many({_revoked_key(user_id): revoked_at for user_id in set(user_ids) if user_id is not None}, timeout)
+
+def tokens_revoked(user_id, auth_time):
+	revoked_at = cache.get(_revoked_key(user_id))
+	return revoked_at is not None and auth_time < revoked_at
+
+
+# Response cache: entries live in the shared 'responses' cache and are keyed
+# by the generation of every model they render. Bumping a generation orphans
+# those entries, which then age out. Generations live in the same cache, so
+# every worker sees a bump, and are random tokens, so a lost or culled one can
+# never revive an orphaned entry.
+
+def _generation_key(model):
+	return f'c2c:responses:generation:{model._meta.label_lower}'
+
+def bump_response_generation(*models):
+	keys = [_generation_key(model) for model in models]
+	caches['responses'].set_many({key: uuid.uuid4().hex for key in keys}, None)
+	transaction.on_commit(lambda: caches['responses'].set_many({key: uuid.uuid4().hex for key in keys}, None))
+
+def response_cache_key(url, scope, models):
+	responses = caches['responses']
+	generations = responses.get_many([_generation_key(model) for model in models])
+	for model in models:
+		key = _generation_key(model)
+		if key not in generations:
+			generations[key] = responses.get_or_set(key, uuid.uuid4().hex, None)
+	parts = [url, scope, *(generations[_generation_key(model)] for model in models)]
+	return 'c2c:response:' + hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+def get_cached_response(key):
+	return caches['responses'].get(key)
+
+def set_cached_response(key, entry):
+	caches['responses'].set(key, entry)
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.caches, deploy=True)
+def check_token_revocation_cache(app_configs, **kwargs):
+	# Revocations are written to the default cache by whichever process made the
+	# change; other web workers only see them through a shared backend.
+	if not settings.ACCESS_TOKEN_REVOCATION or not isinstance(caches['default'], (LocMemCache, DummyCache)):
+		return []
+	return [Warning(
+		'ACCESS_TOKEN_REVOCATION is on but the default cache is per process.',
+		hint='Revoked access tokens keep working in every other worker until they expire. '
+			'Use a shared cache backend (Redis, Memcached) or run a single process.',
+		id='c2c.W001',
+	)]
+
+
+@register(Tags.caches, deploy=True)
+def check_response_cache(app_configs, **kwargs):
+	# Cached responses are invalidated by bumping generations in the same cache;
+	# with a per-process backend, other workers never see the bump.
+	if not isinstance(caches['responses'], LocMemCache):
+		return []
+	return [Warning(
+		"The 'responses' cache is per process.",
+		hint='Each worker keeps serving its cached responses for up to TIMEOUT seconds after the data '
+			'changes in another. Use a shared cache backend (database, Redis) or run a single process.',
+		id='c2c.W002',
+	)]
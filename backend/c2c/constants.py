@@ -1,4 +1,5 @@
 from datetime import timedelta
+from types import MappingProxyType
 
 
 # All Schedule values = age in months
@@ -175,4 +176,26 @@ SERVICE_CHOICES = (
 	)
 
 IMMUNIZATION_CHOICES = tuple((vaccine, data['display_name']) for vaccine, data in EPSDT_REQUIREMENTS['immunization_schedule'].items())
-IMMUNIZATION_DOSES = { vaccine: data['total_doses'] for vaccine, data in EPSDT_REQUIREMENTS['immunization_schedule'].items()}
\ No newline at end of file
+IMMUNIZATION_DOSES = { vaccine: data['total_doses'] for vaccine, data in EPSDT_REQUIREMENTS['immunization_schedule'].items()}
+
+
+def _dose_ages(dose_info):
+	ages = dose_info['age_months']
+	return ages if isinstance(ages, list) else [ages]
+
+def _compile_immunization_schedule():
+	by_age = {}
+	for vaccine, data in EPSDT_REQUIREMENTS['immunization_schedule'].items():
+		for dose_info in data.get('schedule', []):
+			if 'age_months' not in dose_info or 'dose' not in dose_info:
+				continue
+			dose_number = int(dose_info['dose'][0])
+			for age in _dose_ages(dose_info):
+				by_age.setdefault(age, []).append((vaccine, dose_number))
+	return MappingProxyType({age: tuple(doses) for age, doses in sorted(by_age.items())})
+
+# Compiled once at import: age in months -> ((vaccine, dose_number), ...)
+IMMUNIZATIONS_BY_AGE = _compile_immunization_schedule()
+WELL_CHILD_AGES = tuple(EPSDT_REQUIREMENTS['well_child_schedule']['age_in_months'])
+DENTAL_FIRST_AGE = EPSDT_REQUIREMENTS['dental']['schedule'][0]['first_age']
+DENTAL_INTERVAL = EPSDT_REQUIREMENTS['dental']['schedule'][1]['interval_after_first']
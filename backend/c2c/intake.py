@@ -0,0 +1,146 @@
+import csv
+import json
+from collections import defaultdict
+from itertools import islice
+from django.contrib.auth.models import User
+from django.db import transaction
+from .cache import bump_response_generation, invalidate_access
+from .models import Case, Child, ChildAccess, FosterFamily, FosterPlacement, generate_health_services_for_children
+from .serializers import IntakeRowSerializer
+
+# Bulk onboarding of children, each with an optional active placement and case.
+# Rows are flat, with IntakeRowSerializer's fields as CSV columns or NDJSON keys:
+#
+#   first_name,last_name,dob,allergies,foster_family,placement_start_date,caseworker,case_start_date
+#   Ana,Lopez,2019-04-02,,12,2025-01-06,7,2025-01-06
+#
+# Children already on file (same first_name, last_name and dob, Child's
+# unique_together) are skipped and reported as duplicates.
+
+INTAKE_CHUNK_SIZE = 500
+
+INTAKE_FORMATS = {'csv': 'csv', 'ndjson': 'ndjson', 'jsonl': 'ndjson'}
+
+
+def intake_format(filename):
+	return INTAKE_FORMATS.get(filename.rsplit('.', 1)[-1].lower())
+
+
+def read_rows(lines, format):
+	# (line number, row) pairs from an iterable of text lines. Empty values are
+	# dropped so optional columns may be left blank; NDJSON lines that are not
+	# JSON are passed through as strings for the serializer to reject.
+	if format == 'csv':
+		reader = csv.DictReader(lines)
+		for row in reader:
+			yield reader.line_num, {key: value.strip() for key, value in row.items() if key and value and value.strip()}
+		return
+
+	for line_number, line in enumerate(lines, 1):
+		if not line.strip():
+			continue
+		try:
+			row = json.loads(line)
+		except ValueError:
+			yield line_number, line.strip()
+			continue
+		if isinstance(row, dict):
+			row = {key: value for key, value in row.items() if value not in (None, '')}
+		yield line_number, row
+
+
+def import_children(rows, chunk_size=INTAKE_CHUNK_SIZE, progress=None):
+	# Validates and writes chunk_size rows at a time, each chunk with a fixed
+	# number of queries and in its own transaction, so a failure keeps earlier
+	# chunks. Once every chunk is in, health services are generated for the new
+	# cases as a set, one run per case start date (create_case's reference
+	# date); children left unscheduled stay dirty for the monthly job.
+	report = {'rows': 0, 'created': 0, 'duplicates': [], 'errors': []}
+	scheduled = defaultdict(list)
+
+	rows = iter(rows)
+	while chunk := list(islice(rows, chunk_size)):
+		for start_date, children in _import_chunk(chunk, report).items():
+			scheduled[start_date].extend(children)
+		report['rows'] += len(chunk)
+		if progress:
+			progress(report)
+
+	for start_date, children in sorted(scheduled.items()):
+		generate_health_services_for_children(children, start_date)
+	report['errors'].sort(key=lambda error: error['line'])
+	return report
+
+
+def _import_chunk(chunk, report):
+	valid = []
+	for line_number, data in chunk:
+		serializer = IntakeRowSerializer(data=data)
+		if serializer.is_valid():
+			valid.append((line_number, serializer.validated_data))
+		else:
+			report['errors'].append({'line': line_number, 'errors': serializer.errors})
+
+	families = set(FosterFamily.objects.filter(
+		pk__in={row['foster_family'] for _, row in valid if 'foster_family' in row}
+	).values_list('id', flat=True))
+	caseworkers = set(User.objects.filter(
+		pk__in={row['caseworker'] for _, row in valid if 'caseworker' in row}, groups__name='Caseworker'
+	).values_list('id', flat=True))
+	existing = set(Child.objects.filter(
+		last_name__in={row['last_name'] for _, row in valid}, dob__in={row['dob'] for _, row in valid}
+	).values_list('first_name', 'last_name', 'dob'))
+
+	rows = []
+	for line_number, row in valid:
+		key = (row['first_name'], row['last_name'], row['dob'])
+		if key in existing:
+			report['duplicates'].append(line_number)
+			continue
+		errors = {}
+		if 'foster_family' in row and row['foster_family'] not in families:
+			errors['foster_family'] = [f'Unknown foster family {row["foster_family"]}.']
+		if 'caseworker' in row and row['caseworker'] not in caseworkers:
+			errors['caseworker'] = [f'Unknown caseworker {row["caseworker"]}.']
+		if errors:
+			report['errors'].append({'line': line_number, 'errors': errors})
+			continue
+		existing.add(key)
+		rows.append(row)
+	if not rows:
+		return {}
+
+	with transaction.atomic():
+		children = Child.objects.bulk_create([
+			Child(
+				first_name=row['first_name'],
+				last_name=row['last_name'],
+				dob=row['dob'],
+				medications=row.get('medications'),
+				allergies=row.get('allergies')
+			)
+			for row in rows
+		])
+		placements = {placement.child_id: placement for placement in FosterPlacement.objects.bulk_create([
+			FosterPlacement(child=child, foster_family_id=row['foster_family'], start_date=row['placement_start_date'])
+			for child, row in zip(children, rows) if 'foster_family' in row
+		])}
+		cases = Case.objects.bulk_create([
+			Case(
+				child=child,
+				caseworker_id=row.get('caseworker'),
+				placement=placements.get(child.id),
+				status=row['case_status'],
+				start_date=row['case_start_date']
+			)
+			for child, row in zip(children, rows) if 'case_start_date' in row
+		])
+		# bulk_create skips the signals that maintain access and cached responses
+		invalidate_access(ChildAccess.objects.rebuild([child.id for child in children]))
+		bump_response_generation(Child, Case)
+	report['created'] += len(children)
+
+	scheduled = defaultdict(list)
+	for case in cases:
+		scheduled[case.start_date].append(case.child)
+	return scheduled
@@ -0,0 +1,197 @@
+from django.conf import settings
+from django.core.mail import get_connection
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import asyncio
+import logging
+import smtplib
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _session_lost(error):
+	# A refused message leaves the SMTP session usable; a dropped socket does not.
+	# (SMTPException subclasses OSError, so it has to be ruled out explicitly.)
+	if isinstance(error, smtplib.SMTPServerDisconnected):
+		return True
+	return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+def _reopen(connection):
+	connection.close()
+	try:
+		connection.open()
+	except Exception as e:
+		logger.error(f'Could not reopen email connection: {str(e)}')
+
+
+def send_messages_batched(messages, batch_size, limiter=None):
+	# Sends EmailMessages over one backend connection per batch and returns a
+	# list of booleans, one per message. Messages go through the open connection
+	# one at a time so a failure is pinned to the message that caused it
+	# instead of aborting (and obscuring) the rest of the batch. An optional
+	# _RateLimiter paces the sends, across calls if the caller reuses it.
+	results = []
+	for start in range(0, len(messages), batch_size):
+		batch = messages[start:start + batch_size]
+		connection = get_connection(fail_silently=False)
+		try:
+			connection.open()
+		except Exception as e:
+			logger.error(f'Could not open email connection: {str(e)}')
+			results.extend(False for _ in batch)
+			continue
+
+		try:
+			for message in batch:
+				if limiter is not None:
+					limiter.sleep()
+				try:
+					results.append(bool(connection.send_messages([message])))
+				except Exception as e:
+					logger.error(f'Email to {", ".join(message.to)} failed: {str(e)}')
+					results.append(False)
+					if _session_lost(e):
+						_reopen(connection)
+		finally:
+			connection.close()
+	return results
+
+
+def _is_transient(error):
+	# 4xx replies and dropped sessions are worth retrying; 5xx refusals are final
+	if _session_lost(error):
+		return True
+	if isinstance(error, smtplib.SMTPRecipientsRefused):
+		return all(400 <= code < 500 for code, _ in error.recipients.values())
+	if isinstance(error, smtplib.SMTPResponseException):
+		return 400 <= error.smtp_code < 500
+	return False
+
+
+class _RateLimiter:
+	# Thread-safe and not tied to an event loop, so one limiter can pace every
+	# send() of a MessageSender, each of which runs its own loop, or blocking
+	# sends through sleep().
+	def __init__(self, per_second):
+		self.interval = 1 / per_second if per_second else 0
+		self._next_slot = 0
+		self._lock = threading.Lock()
+
+	def _reserve(self):
+		# Takes the next slot and returns the seconds to wait for it
+		if not self.interval:
+			return 0
+		with self._lock:
+			now = time.monotonic()
+			delay = self._next_slot - now
+			self._next_slot = max(now, self._next_slot) + self.interval
+		return delay
+
+	async def wait(self):
+		delay = self._reserve()
+		if delay > 0:
+			await asyncio.sleep(delay)
+
+	def sleep(self):
+		delay = self._reserve()
+		if delay > 0:
+			time.sleep(delay)
+
+
+async def _dispatch(messages, connections, limiter, max_retries, retry_backoff):
+	loop = asyncio.get_running_loop()
+	queue = asyncio.Queue()
+	for index in range(len(messages)):
+		queue.put_nowait(index)
+	results = [False] * len(messages)
+
+	with ThreadPoolExecutor(max_workers=len(connections)) as executor:
+		async def send(connection, message):
+			for attempt in range(max_retries + 1):
+				await limiter.wait()
+				try:
+					return bool(await loop.run_in_executor(executor, connection.send_messages, [message]))
+				except Exception as e:
+					if _session_lost(e):
+						await loop.run_in_executor(executor, _reopen, connection)
+					if attempt == max_retries or not _is_transient(e):
+						logger.error(f'Email to {", ".join(message.to)} failed after {attempt + 1} attempt(s): {str(e)}')
+						return False
+					await asyncio.sleep(retry_backoff * 2 ** attempt)
+
+		async def worker(connection):
+			# Each worker owns one SMTP session
+			while not queue.empty():
+				index = queue.get_nowait()
+				results[index] = await send(connection, messages[index])
+
+		await asyncio.gather(*(worker(connection) for connection in connections))
+	return results
+
+
+class MessageSender:
+	# Sends over up to `concurrency` parallel SMTP sessions, at most `rate_limit`
+	# messages per second overall (0 for no limit), retrying transient failures
+	# with exponential backoff. Sessions and the rate limiter are kept between
+	# send() calls, so a caller sending batch after batch opens its sessions
+	# once and is paced as a whole. Close it (or use it as a context manager)
+	# when done.
+
+	def __init__(self, concurrency, rate_limit=0, max_retries=0, retry_backoff=1.0):
+		self.concurrency = concurrency
+		self.limiter = _RateLimiter(rate_limit)
+		self.max_retries = max_retries
+		self.retry_backoff = retry_backoff
+		self.connections = []
+
+	def send(self, messages):
+		# Returns one boolean per message
+		if not messages:
+			return []
+		while len(self.connections) < min(self.concurrency, len(messages)):
+			connection = get_connection(fail_silently=False)
+			try:
+				connection.open()
+			except Exception as e:
+				logger.error(f'Could not open email connection: {str(e)}')
+			self.connections.append(connection)
+		return asyncio.run(_dispatch(
+			messages, self.connections[:len(messages)], self.limiter, self.max_retries, self.retry_backoff
+		))
+
+	def close(self):
+		for connection in self.connections:
+			connection.close()
+		self.connections = []
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+
+def send_messages_concurrently(messages, concurrency, rate_limit=0, max_retries=0, retry_backoff=1.0):
+	with MessageSender(concurrency, rate_limit, max_retries, retry_backoff) as sender:
+		return sender.send(messages)
+
+
+@contextmanager
+def reminder_sender(rate_limit):
+	# Yields send(messages) -> [bool] for REMINDER_EMAIL_DISPATCH, paced at
+	# `rate_limit` messages per second until the block exits. In 'async' mode
+	# the sessions are kept that long too.
+	if settings.REMINDER_EMAIL_DISPATCH == 'async':
+		with MessageSender(
+			settings.REMINDER_EMAIL_CONCURRENCY,
+			rate_limit,
+			settings.REMINDER_EMAIL_MAX_RETRIES,
+			settings.REMINDER_EMAIL_RETRY_BACKOFF
+		) as sender:
+			yield sender.send
+	else:
+		limiter = _RateLimiter(rate_limit)
+		yield lambda messages: send_messages_batched(messages, settings.REMINDER_EMAIL_BATCH_SIZE, limiter)
@@ -0,0 +1,30 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from c2c.intake import INTAKE_CHUNK_SIZE, import_children, intake_format, read_rows
+
+class Command(BaseCommand):
+	help = 'Import children, with their placements and cases, from a CSV or NDJSON file'
+
+	def add_arguments(self, parser):
+		parser.add_argument('path')
+		parser.add_argument('--format', choices=['csv', 'ndjson'], help='Defaults to the file extension')
+		parser.add_argument('--chunk-size', type=int, default=INTAKE_CHUNK_SIZE)
+
+	def handle(self, *args, **options):
+		format = options['format'] or intake_format(options['path'])
+		if format is None:
+			raise CommandError('Cannot tell the format from the file name; pass --format.')
+
+		def progress(report):
+			self.stdout.write(f'{report["rows"]} rows read, {report["created"]} children created')
+
+		with open(options['path'], encoding='utf-8-sig', newline='') as lines:
+			report = import_children(read_rows(lines, format), options['chunk_size'], progress)
+
+		for error in report['errors']:
+			self.stderr.write(f'Line {error["line"]}: {json.dumps(error["errors"])}')
+		if report['duplicates']:
+			self.stdout.write(f'Skipped {len(report["duplicates"])} children already on file (lines {", ".join(map(str, report["duplicates"]))})')
+		self.stdout.write(self.style.SUCCESS(
+			f'Imported {report["created"]} of {report["rows"]} rows, {len(report["errors"])} rejected'
+		))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from c2c.cache import bump_response_generation, invalidate_access
+from c2c.models import Case, Child, ChildAccess, HealthService
+
+class Command(BaseCommand):
+	help = 'Rebuild the ChildAccess table from open cases and active placements'
+
+	def handle(self, *args, **options):
+		# For recovery after writes that bypassed model signals (raw SQL, queryset.update()).
+		# Drops only what those signals would have: never the whole cache, which
+		# also holds token revocations.
+		user_ids = ChildAccess.objects.rebuild()
+		invalidate_access(user_ids)
+		bump_response_generation(Child, Case, HealthService)
+		self.stdout.write(self.style.SUCCESS(f'Rebuilt child access for {len(user_ids)} users'))
@@ -22,5 +22,13 @@ class Command(BaseCommand):
 			cron = '0 0 * * *' # Every day at 12am
 		)
 
+		# Pick up reminders left in the outbox by interrupted drainers
+		schedule(
+			func = 'c2c.tasks.drain_notification_outbox',
+			name = 'notification_outbox_drainer',
+			schedule_type = Schedule.MINUTES,
+			minutes = 15
+		)
+
 		self.stdout.write(self.style.SUCCESS('Schedules setup successfully'))
 		
\ No newline at end of file
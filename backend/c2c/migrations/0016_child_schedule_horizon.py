@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('c2c', '0015_remove_fosterfamily_current_occupancy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='child',
+            name='schedule_dirty',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='child',
+            name='schedule_horizon',
+            field=models.DateField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='child',
+            index=models.Index(condition=models.Q(('schedule_dirty', True)), fields=['id'], name='child_schedule_dirty_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_immunization_status(apps, schema_editor):
+    ImmunizationRecord = apps.get_model('c2c', 'ImmunizationRecord')
+    ImmunizationStatus = apps.get_model('c2c', 'ImmunizationStatus')
+    latest = ImmunizationRecord.objects.order_by(
+        'child_id', 'vaccine_name', '-dose_number'
+    ).distinct('child_id', 'vaccine_name').values_list('child_id', 'vaccine_name', 'dose_number', 'date_administered')
+    ImmunizationStatus.objects.bulk_create([
+        ImmunizationStatus(child_id=child_id, vaccine_name=vaccine, highest_dose=dose_number, last_administered=date_administered)
+        for child_id, vaccine, dose_number, date_administered in latest.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('c2c', '0016_child_schedule_horizon'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImmunizationStatus',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vaccine_name', models.CharField(choices=[('HepB', 'Hepatitis B'), ('RV1', 'Rotavirus (RV1)'), ('RV5', 'Rotavirus (RV5)'), ('DTaP', 'Diphtheria, tetanus, acellular pertussis'), ('Tdap', 'Tetanus, diphtheria, acellular pertussis'), ('Hib', 'Haemophilus influenzae type b'), ('PCV15', 'Pneumococcal polysaccharide vaccine (PCV15)'), ('PCV20', 'Pneumococcal polysaccharide vaccine (PCV20)'), ('IPV', 'Inactivated poliovirus (IPV)'), ('MMR', 'Measles, mumps, rubella (MMR)'), ('VAR', 'Varicella (VAR)'), ('HepA', 'Hepatitis A (HepA)'), ('HPV', 'Human papillomavirus (HPV)'), ('MenACWY-TT', 'Meningococcal (MenACWY-TT)'), ('IIV3', 'Influenza (IIV3)'), ('COVID_mRNA', 'COVID-19 (1vCOV-mRNA)'), ('COVID_aPS', 'COVID-19 (1vCOV-aPS)'), ('None', 'None')])),
+                ('highest_dose', models.PositiveSmallIntegerField()),
+                ('last_administered', models.DateField(blank=True, null=True)),
+                ('child', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='immunization_statuses', to='c2c.child')),
+            ],
+            options={
+                'verbose_name_plural': 'immunization statuses',
+                'unique_together': {('child', 'vaccine_name')},
+            },
+        ),
+        migrations.RunPython(backfill_immunization_status, migrations.RunPython.noop),
+    ]
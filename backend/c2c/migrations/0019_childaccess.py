@@ -0,0 +1,50 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_child_access(apps, schema_editor):
+    Case = apps.get_model('c2c', 'Case')
+    FosterPlacement = apps.get_model('c2c', 'FosterPlacement')
+    ChildAccess = apps.get_model('c2c', 'ChildAccess')
+    rows = [
+        ChildAccess(user_id=caseworker_id, child_id=child_id, role='Caseworker')
+        for child_id, caseworker_id in Case.objects.filter(
+            status='open', caseworker__isnull=False
+        ).values_list('child_id', 'caseworker_id').iterator()
+    ]
+    for child_id, parent1_id, parent2_id in FosterPlacement.objects.filter(
+        end_date__isnull=True, child__isnull=False, foster_family__isnull=False
+    ).values_list('child_id', 'foster_family__parent1_id', 'foster_family__parent2_id').iterator():
+        rows.extend(
+            ChildAccess(user_id=parent_id, child_id=child_id, role='FosterParent')
+            for parent_id in (parent1_id, parent2_id) if parent_id is not None
+        )
+    ChildAccess.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('c2c', '0018_notificationoutbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChildAccess',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('Caseworker', 'Caseworker'), ('FosterParent', 'FosterParent')])),
+                ('child', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='access', to='c2c.child')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='child_access', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'child access',
+                'constraints': [models.UniqueConstraint(fields=('user', 'role', 'child'), name='unique_child_access')],
+            },
+        ),
+        migrations.RunPython(backfill_child_access, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('c2c', '0019_childaccess'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='healthservice',
+            index=models.Index(fields=['due_date', 'id'], name='healthservice_due_date_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('c2c', '0023_notificationoutbox_claims'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='child',
+            name='schedule_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
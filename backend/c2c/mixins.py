@@ -1,25 +1,35 @@
+from rest_framework.serializers import BaseSerializer
 from rest_framework.viewsets import ViewSetMixin
-from django.db.models import Q
+import hashlib
+from itertools import islice
+from django.db.models import Count, Exists, Max, OuterRef, Q
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.http import StreamingHttpResponse
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework.response import Response
 from django.contrib.auth.models import User
-from .models import Case, Child, FosterFamily, FosterPlacement, HealthService, ImmunizationRecord, ReminderLog
-
-
-def get_accessible_child_ids(user):
-	if user.groups.filter(name='Caseworker').exists():
-		return set(
-			Case.objects.filter(caseworker=user, status='open').values_list('child_id', flat=True)
-		)
-	if user.groups.filter(name='FosterParent').exists():
-		return set(
-			FosterPlacement.objects.filter(
-				(Q(foster_family__parent1=user) | Q(foster_family__parent2=user)),
-				end_date__isnull=True
-			).values_list('child_id', flat=True)
-		)
+from rest_framework_simplejwt.tokens import Token
+from .cache import get_cached_access, get_cached_response, response_cache_key, set_cached_access, set_cached_response
+from .models import Case, Child, ChildAccess, FosterFamily, FosterPlacement, HealthService, ImmunizationRecord, ReminderLog
+from .renderers import dumps
+
+
+def get_child_access(user, role):
+	return ChildAccess.objects.filter(user_id=user.pk, role=role)
+
+def get_accessible_child_ids(user, role=None):
+	if role is None:
+		role = get_user_role(user)
+
+	if role in ('Caseworker', 'FosterParent'):
+		return set(get_child_access(user, role).values_list('child_id', flat=True))
 	return set()
 
 def get_user_role(user):
-	groups = set(user.groups.values_list('name', flat=True))
+	return get_role_for_groups(user.groups.values_list('name', flat=True))
+
+def get_role_for_groups(group_names):
+	groups = set(group_names)
 
 	for role in ('Supervisor', 'Caseworker', 'FosterParent'):
 		if role in groups:
@@ -27,6 +37,160 @@ def get_user_role(user):
 	
 	return None
 
+def get_request_access(request):
+	# Role and accessible child ids, resolved once per request and shared by
+	# RoleBasedQuerySetMixin and RoleBasedPermission. Across requests they come
+	# from the cache, which c2c.signals clears when a user's scope changes.
+	# A role claim in the access token takes precedence over the user's groups.
+	access = getattr(request, '_c2c_access', None)
+	claims = request.auth if isinstance(request.auth, Token) and 'role' in request.auth else None
+	if access is None:
+		access = get_cached_access(request.user.pk)
+	if access is None or (claims is not None and access[0] != claims['role']):
+		role = claims['role'] if claims is not None else get_user_role(request.user)
+		child_ids = get_accessible_child_ids(request.user, role) if role in ('Caseworker', 'FosterParent') else set()
+		set_cached_access(request.user.pk, role, child_ids)
+		access = (role, child_ids)
+	request._c2c_access = access
+	return access
+
+def get_request_scope(request):
+	# Role plus a digest of the accessible child ids: two requests with the
+	# same scope see the same rows, so it keys cached responses and ETags
+	role, child_ids = get_request_access(request)
+	if role not in ('Caseworker', 'FosterParent'):
+		return str(role)
+	return f'{role}:{hashlib.sha1(",".join(map(str, sorted(child_ids))).encode()).hexdigest()}'
+
+
+def get_query_list(request, param):
+	return {value.strip() for value in request.query_params.get(param, '').split(',') if value.strip()}
+
+
+class StreamingListMixin(ViewSetMixin):
+	# list?stream=1 returns the whole scoped queryset as one JSON array,
+	# unpaginated, uncached and written incrementally: rows are read with a
+	# server-side cursor and serialized stream_chunk_size at a time, so memory
+	# stays flat however large the export. GZipMiddleware compresses the body.
+	stream_chunk_size = 2000
+
+	def list(self, request, *args, **kwargs):
+		if request.query_params.get('stream') != '1':
+			return super().list(request, *args, **kwargs)
+		queryset = self.filter_queryset(self.get_queryset()).order_by(*(getattr(self, 'ordering', None) or ('id',)))
+		return StreamingHttpResponse(self._stream_rows(queryset), content_type='application/json')
+
+	def _stream_rows(self, queryset):
+		rows = queryset.iterator(chunk_size=self.stream_chunk_size)
+		separator = b'['
+		while chunk := list(islice(rows, self.stream_chunk_size)):
+			yield separator + b','.join(dumps(item) for item in self.get_serializer(chunk, many=True).data)
+			separator = b','
+		yield b']' if separator == b',' else b'[]'
+
+
+class ResponseCacheMixin(ViewSetMixin):
+	# list and retrieve responses are cached per URL and access scope rather
+	# than per user, so users who reach the same children share entries.
+	# cache_models names every model a response renders; saving or deleting
+	# any of them (c2c.signals, bulk paths) invalidates the entries.
+	cache_models = ()
+
+	def list(self, request, *args, **kwargs):
+		return self._cached_response(super().list, request, *args, **kwargs)
+
+	def retrieve(self, request, *args, **kwargs):
+		return self._cached_response(super().retrieve, request, *args, **kwargs)
+
+	def _cached_response(self, render, request, *args, **kwargs):
+		key = response_cache_key(request.build_absolute_uri(), get_request_scope(request), self.cache_models)
+		entry = get_cached_response(key)
+		if entry is None:
+			response = render(request, *args, **kwargs)
+			if response.status_code == 200:
+				headers = {header: response[header] for header in ('ETag', 'Last-Modified', 'Cache-Control') if header in response}
+				set_cached_response(key, (response.data, headers))
+			return response
+
+		data, headers = entry
+		response = get_conditional_response(
+			request, etag=headers.get('ETag'), last_modified=parse_http_date_safe(headers.get('Last-Modified'))
+		) or Response(data)
+		for header, value in headers.items():
+			response[header] = value
+		return response
+
+
+class ConditionalGetMixin(ViewSetMixin):
+	# list and retrieve carry a weak ETag derived from the access scope and
+	# the scoped queryset's row count and latest updated_date, and that of
+	# every ?expand= relation rendered with it. A request whose validators
+	# still match gets a 304 from that one aggregate, unserialized.
+	# Only retrieve sends Last-Modified: a list loses rows to deletes and
+	# reassignments without its latest updated_date moving.
+
+	def list(self, request, *args, **kwargs):
+		return self._conditional_get(self.filter_queryset(self.get_queryset()), super().list, *args, **kwargs)
+
+	def retrieve(self, request, *args, **kwargs):
+		lookup = kwargs[self.lookup_url_kwarg or self.lookup_field]
+		queryset = self.filter_queryset(self.get_queryset()).filter(**{self.lookup_field: lookup})
+		return self._conditional_get(queryset, super().retrieve, *args, **kwargs)
+
+	def _conditional_get(self, queryset, render, *args, **kwargs):
+		expanded = sorted(get_query_list(self.request, 'expand') & set(getattr(self.get_serializer_class(), 'expandable_fields', {})))
+		modified = {'modified': Max('updated_date'), **{f'{field}_modified': Max(f'{field}__updated_date') for field in expanded}}
+		state = queryset.order_by().aggregate(count=Count('pk'), **modified)
+		if not state['count'] and self.action == 'retrieve':
+			return render(self.request, *args, **kwargs)
+
+		# The user, scope and full path are hashed in too: the representation
+		# depends on them and on ?fields=, ?expand=, the cursor and search parameters
+		validators = ':'.join([
+			str(self.request.user.pk), get_request_scope(self.request), self.request.get_full_path(),
+			str(state['count']), *(str(state[key]) for key in modified),
+		])
+		etag = f'W/"{hashlib.sha1(validators.encode()).hexdigest()}"'
+		latest = max((state[key] for key in modified if state[key]), default=None)
+		last_modified = int(latest.timestamp()) if latest and self.action == 'retrieve' else None
+
+		response = get_conditional_response(self.request, etag=etag, last_modified=last_modified)
+		if response is None:
+			response = render(self.request, *args, **kwargs)
+		if response.status_code in (200, 304):
+			response['ETag'] = etag
+			if last_modified:
+				response['Last-Modified'] = http_date(last_modified)
+			patch_cache_control(response, private=True, no_cache=True)
+		return response
+
+
+class SparseFieldsetQuerySetMixin(ViewSetMixin):
+	# Loads only the columns the serializer will render for list and retrieve,
+	# joining expanded relations (see SparseFieldsetMixin) in the same query.
+
+	def get_queryset(self):
+		queryset = super().get_queryset()
+		if self.action not in ('list', 'retrieve'):
+			return queryset
+
+		serializer = self.get_serializer()
+		concrete = {field.name: field for field in queryset.model._meta.concrete_fields}
+		# Keep the pagination ordering loaded too; the cursor is read from it
+		columns = {queryset.model._meta.pk.name, *(field.lstrip('-') for field in getattr(self, 'ordering', None) or ())}
+		for field in serializer.fields.values():
+			model_field = concrete.get(field.source)
+			if model_field is None:
+				continue
+			columns.add(field.source)
+			if model_field.is_relation and isinstance(field, BaseSerializer):
+				queryset = queryset.select_related(field.source)
+				related = {related_field.name for related_field in model_field.related_model._meta.concrete_fields}
+				columns.update(
+					f'{field.source}__{nested.source}' for nested in field.fields.values() if nested.source in related
+				)
+		return queryset.only(*columns)
+
 
 class RoleBasedQuerySetMixin(ViewSetMixin):
 
@@ -37,39 +201,41 @@ class RoleBasedQuerySetMixin(ViewSetMixin):
 		if not user.is_authenticated:
 			return model.objects.none()
 		
-		role = get_user_role(user)
+		role, child_ids = get_request_access(self.request)
 
 		if role == 'Supervisor':
 			return model.objects.all()
 		if role not in ('Caseworker', 'FosterParent'):
 			return model.objects.none()
 		
-		child_ids = get_accessible_child_ids(user)
 		if not child_ids:
 			return model.objects.none()
 		
 		if model == FosterFamily:
 			if role == 'Caseworker':
 				return model.objects.all()
-			return model.objects.filter(Q(parent1=user) | Q(parent2=user)).distinct()
+			return model.objects.filter(Q(parent1_id=user.pk) | Q(parent2_id=user.pk)).distinct()
 	
+		# Scoped in SQL against ChildAccess, however many children the user reaches
+		access = get_child_access(user, role)
 		if model == User:
-			caseworker_ids = (
-				Case.objects.filter(child_id__in=child_ids, status='open').values_list('caseworker_id', flat=True).distinct()
-			)
-			return model.objects.filter(id__in=caseworker_ids)
+			return model.objects.filter(Exists(
+				Case.objects.filter(caseworker_id=OuterRef('pk'), status='open', child_id__in=access.values('child_id'))
+			))
 		
-		filters = {
-			Child: {'id__in': child_ids},
-			Case: {'child_id__in': child_ids},
-			HealthService: {'child_id__in': child_ids},
-			ImmunizationRecord: {'child_id__in': child_ids},
-			FosterPlacement: {'child_id__in': child_ids},
-			ReminderLog: {'service__child_id__in': child_ids},
+		child_fields = {
+			Child: 'pk',
+			Case: 'child_id',
+			HealthService: 'child_id',
+			ImmunizationRecord: 'child_id',
+			FosterPlacement: 'child_id',
+			ReminderLog: 'service__child_id',
 		}
 
-		filter_kwargs = filters.get(model)
-		return model.objects.filter(**filter_kwargs) if filter_kwargs else model.objects.none()
+		child_field = child_fields.get(model)
+		if child_field is None:
+			return model.objects.none()
+		return model.objects.filter(Exists(access.filter(child_id=OuterRef(child_field))))
 		
 
 	
\ No newline at end of file
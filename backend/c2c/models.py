@@ -1,12 +1,17 @@
-from django.db import models, transaction
-from django.db.models import Q, UniqueConstraint
+from django.db import connection, models, transaction
+from django.db.models import Exists, F, OuterRef, Q, UniqueConstraint
+from django.db.models.functions import Lower
+from django.contrib.postgres.indexes import OpClass
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from multiselectfield import MultiSelectField
-from .constants import SERVICE_CHOICES, IMMUNIZATION_CHOICES, IMMUNIZATION_DOSES, EPSDT_REQUIREMENTS
+from .cache import bump_response_generation
+from .constants import SERVICE_CHOICES, IMMUNIZATION_CHOICES, IMMUNIZATION_DOSES, IMMUNIZATIONS_BY_AGE, WELL_CHILD_AGES, DENTAL_FIRST_AGE, DENTAL_INTERVAL
 from django.utils import timezone
 from datetime import timedelta
+from collections import defaultdict
 from dateutil.relativedelta import relativedelta
+import numpy as np
 
 class Child(models.Model):
 	first_name = models.CharField(max_length=150)
@@ -14,14 +19,60 @@ class Child(models.Model):
 	dob = models.DateField()
 	medications = models.TextField(blank=True, null=True)
 	allergies = models.TextField(blank=True, null=True)
+	updated_date = models.DateTimeField(auto_now=True)
+	# Due-date watermark: HealthService generation is complete for this child up to
+	# here. Dirty children are re-evaluated on the next run regardless of horizon.
+	schedule_horizon = models.DateField(null=True, blank=True, db_index=True)
+	schedule_dirty = models.BooleanField(default=True)
+	# Bumped with every mark_schedule_dirty(); the generator only clears the flag
+	# if the version is still the one it read before planning.
+	schedule_version = models.PositiveIntegerField(default=0)
 
 	class Meta:
 		verbose_name_plural = 'children'
 		unique_together = ('first_name', 'last_name', 'dob')
+		indexes = [
+			models.Index(fields=['id'], condition=Q(schedule_dirty=True), name='child_schedule_dirty_idx'),
+			# Case-insensitive prefix search on /api/children/
+			models.Index(OpClass(Lower('last_name'), name='text_pattern_ops'), OpClass(Lower('first_name'), name='text_pattern_ops'), name='child_last_name_lower_idx'),
+			models.Index(OpClass(Lower('first_name'), name='text_pattern_ops'), name='child_first_name_lower_idx'),
+			models.Index(fields=['dob'], name='child_dob_idx'),
+		]
 
 	def __str__(self):
 		return f'{self.last_name}, {self.first_name}'
 
+	@classmethod
+	def from_db(cls, db, field_names, values):
+		instance = super().from_db(db, field_names, values)
+		instance._loaded_dob = dict(zip(field_names, values)).get('dob')
+		return instance
+
+	def save(self, *args, **kwargs):
+		# A plain save() of an existing child writes every concrete field except
+		# SCHEDULE_FIELDS, as if update_fields had listed them. Those columns are
+		# only written by mark_schedule_dirty() and the generator, in single
+		# UPDATE statements, and an instance loaded before either ran carries
+		# stale values: saving them back would clear a pending dirty mark or
+		# rewind schedule_version. Pass update_fields explicitly to write them
+		# anyway; creates write every field as usual.
+		dob_changed = not self._state.adding and self.dob != getattr(self, '_loaded_dob', self.dob)
+		if not self._state.adding and kwargs.get('update_fields') is None:
+			kwargs['update_fields'] = [
+				field.name for field in self._meta.concrete_fields
+				if not field.primary_key and field.name not in SCHEDULE_FIELDS
+			]
+		super().save(*args, **kwargs)
+		self._loaded_dob = self.dob
+		if dob_changed:
+			mark_schedule_dirty([self.pk])
+			self.schedule_dirty = True
+
+SCHEDULE_FIELDS = ('schedule_horizon', 'schedule_dirty', 'schedule_version')
+
+def mark_schedule_dirty(child_ids):
+	Child.objects.filter(id__in=child_ids).update(schedule_dirty=True, schedule_version=F('schedule_version') + 1)
+
 class FosterFamily(models.Model):
 	family_name = models.CharField(max_length=256)
 	parent1 = models.ForeignKey(User, on_delete=models.PROTECT, null=True, related_name='parent1')
@@ -46,6 +97,7 @@ class FosterPlacement(models.Model):
 	start_date = models.DateField()
 	end_date = models.DateField(blank=True, null=True)
 	end_reason = models.TextField(null=True, blank=True)
+	updated_date = models.DateTimeField(auto_now=True)
 
 	class Meta:
 		constraints = [
@@ -76,78 +128,200 @@ def calculate_age_in_months(date_of_birth, reference_date=None):
 	return delta_age.years * 12 + delta_age.months
 
 
-def generate_health_services(child, reference_date):
-	current_age_months = calculate_age_in_months(child.dob, reference_date)
+def calculate_ages_in_months(dates_of_birth, reference_dates=None):
+	# Vectorized calculate_age_in_months(): dates_of_birth and reference_dates
+	# broadcast against each other. Matches relativedelta, which counts a month
+	# once the (end-of-month clipped) monthly anniversary has been reached.
+	if reference_dates is None:
+		reference_dates = timezone.now().date()
+	dob, ref = np.broadcast_arrays(
+		np.asarray(dates_of_birth, dtype='datetime64[D]'),
+		np.asarray(reference_dates, dtype='datetime64[D]')
+	)
+
+	dob_month = dob.astype('datetime64[M]')
+	ref_month = ref.astype('datetime64[M]')
+	months = (ref_month - dob_month).astype(np.int64)
+
+	dob_day = (dob - dob_month).astype(np.int64)
+	ref_day = (ref - ref_month).astype(np.int64)
+	ref_month_days = ((ref_month + 1).astype('datetime64[D]') - ref_month.astype('datetime64[D]')).astype(np.int64)
+	anniversary_day = np.minimum(dob_day, ref_month_days - 1)
+
+	months -= (ref >= dob) & (anniversary_day > ref_day)
+	months += (ref < dob) & (anniversary_day < ref_day)
+	return months
+
+
+def _plan_health_services(child, reference_date, current_age_months, recorded_doses, well_child_dates, dental_dates):
 	age_in_3months = current_age_months + 3
 	due_date_offset = 10 if current_age_months < 30 else 30
-	wc_count = 0
-	dental_count = 0
+	planned = []
 
-	services_by_date = {}
-	for age in EPSDT_REQUIREMENTS['well_child_schedule']['age_in_months']:
+	for age in WELL_CHILD_AGES:
 		if current_age_months < age <= age_in_3months:
 			due_date = child.dob + relativedelta(months=age) + timedelta(days=due_date_offset)
-			services_by_date[due_date] = {
-				'age_months': age,
-				'services': ['well_child'],
-				'immunizations': []
-			}
-
-	for date, data in services_by_date.items():
-		age = data['age_months']
-		for vaccine, vaccine_data in EPSDT_REQUIREMENTS['immunization_schedule'].items():
-			for dose_info in vaccine_data.get('schedule', []):
-				if 'age_months' in dose_info and 'dose' in dose_info:
-					dose_ages = dose_info['age_months'] if isinstance(dose_info['age_months'], list) else [dose_info['age_months']]
-					if age in dose_ages:
-						if not ImmunizationRecord.objects.filter(
-							child=child,
-							vaccine_name=vaccine,
-							dose_number=int(dose_info['dose'][0]),
-						).exists():
-							data['immunizations'].append(vaccine)
-	
-	for date, data in services_by_date.items():
-		if not HealthService.objects.filter(child=child, service__contains='well_child', due_date=date).exists():
-			HealthService.objects.create(
+			if due_date in well_child_dates:
+				continue
+			immunizations = [
+				vaccine for vaccine, dose_number in IMMUNIZATIONS_BY_AGE.get(age, ())
+				if (vaccine, dose_number) not in recorded_doses
+			]
+			planned.append(HealthService(
 				child=child,
-				service=data['services'],
-				immunizations=data['immunizations'],
-				due_date=date,
+				service=['well_child'],
+				immunizations=immunizations,
+				due_date=due_date,
 				status='pending'
-			)
-			wc_count +=1
-	
-	dental_due = None
+			))
 
-	if current_age_months >= 12:
-		last_dental = HealthService.objects.filter(
-			child=child, service__contains='dental'
-		).order_by('-due_date').first()
+	dental_due = None
 
-		if not last_dental:
+	if current_age_months >= DENTAL_FIRST_AGE:
+		if not dental_dates:
 			dental_due = reference_date + timedelta(days=30)
 		else:
-			next_dental = last_dental.due_date + timedelta(days=183)
+			next_dental = max(dental_dates) + DENTAL_INTERVAL
 			if next_dental <= reference_date + timedelta(days=90):
 				dental_due = next_dental
-	
-	elif current_age_months < 12 <= age_in_3months:
-		dental_due = child.dob + relativedelta(months=12) + timedelta(days=due_date_offset)
-		
-	if dental_due:
-		if not HealthService.objects.filter(
-			child=child, service__contains='dental', due_date=dental_due
-		).exists():
-			HealthService.objects.create(
-				child=child,
-				service=['dental'],
-				due_date=dental_due,
-				status='pending'
-			)
-			dental_count +=1
 
-	return wc_count, dental_count
+	elif current_age_months < DENTAL_FIRST_AGE <= age_in_3months:
+		dental_due = child.dob + relativedelta(months=DENTAL_FIRST_AGE) + timedelta(days=due_date_offset)
+
+	if dental_due and dental_due not in dental_dates:
+		planned.append(HealthService(
+			child=child,
+			service=['dental'],
+			due_date=dental_due,
+			status='pending'
+		))
+
+	return planned
+
+
+def _next_schedule_horizon(child, reference_date, current_age_months, dental_dates):
+	# Earliest date on which a later run would find something new to create,
+	# expressed as the due-date horizon (trigger date + the 90 day window).
+	triggers = []
+	next_ages = [age for age in WELL_CHILD_AGES if age > current_age_months + 3]
+	if next_ages:
+		triggers.append(child.dob + relativedelta(months=next_ages[0] - 3))
+
+	if dental_dates:
+		triggers.append(max(dental_dates) + DENTAL_INTERVAL - timedelta(days=90))
+	elif current_age_months + 3 < DENTAL_FIRST_AGE:
+		triggers.append(child.dob + relativedelta(months=DENTAL_FIRST_AGE - 3))
+	else:
+		triggers.append(reference_date)
+
+	return max(min(triggers), reference_date) + timedelta(days=90)
+
+
+def generate_health_services_for_children(children, reference_date):
+	# Fixed number of queries regardless of len(children): one read each for
+	# schedule versions, immunization history and existing services, one bulk
+	# insert and one update.
+	children = list(children)
+	if not children:
+		return 0, 0
+	child_ids = [child.id for child in children]
+	# Read before any input: a child marked dirty from here on keeps its flag
+	versions = dict(Child.objects.filter(id__in=child_ids).values_list('id', 'schedule_version'))
+
+	recorded_doses = ImmunizationStatus.objects.recorded_doses(child_ids)
+
+	well_child_dates = defaultdict(set)
+	dental_dates = defaultdict(set)
+	for child_id, service, due_date in HealthService.objects.filter(
+		Q(service__contains='well_child') | Q(service__contains='dental'),
+		child_id__in=child_ids
+	).values_list('child_id', 'service', 'due_date'):
+		if 'well_child' in service:
+			well_child_dates[child_id].add(due_date)
+		if 'dental' in service:
+			dental_dates[child_id].add(due_date)
+
+	ages = calculate_ages_in_months([child.dob for child in children], reference_date)
+
+	planned = []
+	for child, current_age_months in zip(children, ages.tolist()):
+		child_planned = _plan_health_services(
+			child,
+			reference_date,
+			current_age_months,
+			recorded_doses[child.id],
+			well_child_dates[child.id],
+			dental_dates[child.id]
+		)
+		planned.extend(child_planned)
+
+		child_dental_dates = dental_dates[child.id] | {service.due_date for service in child_planned if 'dental' in service.service}
+		child.schedule_horizon = _next_schedule_horizon(child, reference_date, current_age_months, child_dental_dates)
+		child.schedule_dirty = False
+
+	HealthService.objects.bulk_create(planned)
+	_record_schedule_horizons(children, versions)
+	if planned:
+		bump_response_generation(HealthService)
+
+	wc_count = sum(1 for service in planned if 'well_child' in service.service)
+	return wc_count, len(planned) - wc_count
+
+
+def _record_schedule_horizons(children, versions):
+	# One statement of constant size however many children: the new horizons
+	# and the versions read before planning are passed as arrays and joined
+	# in, and the dirty flag is only cleared where the version is unchanged.
+	with connection.cursor() as cursor:
+		cursor.execute(
+			f'UPDATE {Child._meta.db_table} AS child'
+			' SET schedule_horizon = planned.horizon,'
+			' schedule_dirty = child.schedule_dirty AND child.schedule_version <> planned.version'
+			' FROM unnest(%s::bigint[], %s::integer[], %s::date[]) AS planned(id, version, horizon)'
+			' WHERE child.id = planned.id',
+			[
+				[child.id for child in children],
+				[versions.get(child.id) for child in children],
+				[child.schedule_horizon for child in children],
+			]
+		)
+
+
+def generate_health_services(child, reference_date):
+	return generate_health_services_for_children([child], reference_date)
+
+
+def project_health_services(child, recorded_doses, existing_services, start_date, until):
+	# Replays the generator in memory: one run on start_date, then one on the 1st
+	# of every month (the monthly job's cadence) until `until`. Nothing is saved.
+	well_child_dates = {service.due_date for service in existing_services if 'well_child' in service.service}
+	dental_dates = {service.due_date for service in existing_services if 'dental' in service.service}
+	projected = []
+
+	run_dates = []
+	run_date = start_date
+	while run_date <= until:
+		run_dates.append(run_date)
+		run_date = run_date.replace(day=1) + relativedelta(months=1)
+	ages = calculate_ages_in_months(child.dob, run_dates).tolist()
+
+	for run_date, current_age_months in zip(run_dates, ages):
+		planned = _plan_health_services(
+			child,
+			run_date,
+			current_age_months,
+			recorded_doses,
+			well_child_dates,
+			dental_dates
+		)
+		for service in planned:
+			if 'well_child' in service.service:
+				well_child_dates.add(service.due_date)
+			if 'dental' in service.service:
+				dental_dates.add(service.due_date)
+		projected.extend(service for service in planned if service.due_date <= until)
+
+	return sorted(projected, key=lambda service: service.due_date)
 
 class CaseManager(models.Manager):
 	@transaction.atomic
@@ -172,6 +346,7 @@ class Case(models.Model):
 	start_date = models.DateField()
 	end_date = models.DateField(null=True, blank=True)
 	status = models.CharField(choices=[('open', 'Open'), ('closed', 'Closed')], default='open')	
+	updated_date = models.DateTimeField(auto_now=True)
 
 	class Meta:
 		constraints=[
@@ -181,8 +356,93 @@ class Case(models.Model):
 				name='unique_open_case'
 			)
 		]
+
+	@classmethod
+	def from_db(cls, db, field_names, values):
+		instance = super().from_db(db, field_names, values)
+		instance._loaded_status = dict(zip(field_names, values)).get('status')
+		return instance
+
+	def save(self, *args, **kwargs):
+		opened = self.status == 'open' and (self._state.adding or getattr(self, '_loaded_status', None) != 'open')
+		super().save(*args, **kwargs)
+		self._loaded_status = self.status
+		if opened:
+			mark_schedule_dirty([self.child_id])
 	
+class HealthServiceManager(models.Manager):
+	@transaction.atomic
+	def bulk_complete(self, completions):
+		# completions: [(service, completed_date), ...]. Applies the same dose
+		# rules as HealthService.save(), worked out in memory, with a fixed
+		# number of statements however many services are completed.
+		completions = [(service, completed_date) for service, completed_date in completions if service.status != 'complete']
+		if not completions:
+			return []
+		child_ids = {service.child_id for service, _ in completions}
+
+		highest_dose = {}
+		administered = set()
+		for child_id, vaccine, dose_number, last_administered in ImmunizationStatus.objects.filter(
+			child_id__in=child_ids
+		).values_list('child_id', 'vaccine_name', 'highest_dose', 'last_administered'):
+			highest_dose[(child_id, vaccine)] = dose_number
+			if last_administered:
+				administered.add((child_id, vaccine, dose_number))
+
+		now = timezone.now()
+		new_records = []
+		errors = {}
+		for service, completed_date in sorted(completions, key=lambda completion: (completion[1], completion[0].id)):
+			service.status = 'complete'
+			service.completed_date = completed_date
+			service.updated_date = now
+
+			for vaccine in service.immunizations or []:
+				total = IMMUNIZATION_DOSES.get(vaccine, 0)
+				key = (service.child_id, vaccine)
+				next_dose = highest_dose.get(key, 0) + 1
+				if next_dose > total:
+					continue
+				if next_dose > 1 and (service.child_id, vaccine, next_dose - 1) not in administered:
+					errors.setdefault(str(service.id), []).append(
+						f'{vaccine}: Dose #{next_dose} requires dose #{next_dose-1} to be administered first.'
+					)
+					continue
+
+				new_records.append(ImmunizationRecord(
+					child_id=service.child_id,
+					vaccine_name=vaccine,
+					dose_number=next_dose,
+					total_doses=total,
+					date_administered=completed_date
+				))
+				highest_dose[key] = next_dose
+				administered.add((service.child_id, vaccine, next_dose))
+
+		if errors:
+			raise ValidationError(errors)
+
+		self.bulk_update([service for service, _ in completions], ['status', 'completed_date', 'updated_date'])
+		bump_response_generation(HealthService)
+		ImmunizationRecord.objects.bulk_create(new_records)
+		if new_records:
+			# Records are created in dose order, so the last one per key is the highest
+			latest = {(record.child_id, record.vaccine_name): record for record in new_records}
+			ImmunizationStatus.objects.bulk_create(
+				[
+					ImmunizationStatus(child_id=child_id, vaccine_name=vaccine, highest_dose=record.dose_number, last_administered=record.date_administered)
+					for (child_id, vaccine), record in latest.items()
+				],
+				update_conflicts=True,
+				unique_fields=['child', 'vaccine_name'],
+				update_fields=['highest_dose', 'last_administered']
+			)
+		mark_schedule_dirty(child_ids)
+		return new_records
+
 class HealthService(models.Model):	
+	objects = HealthServiceManager()
 	child = models.ForeignKey(Child, on_delete=models.CASCADE)
 	service = MultiSelectField(choices=SERVICE_CHOICES, min_choices=1)
 	immunizations = MultiSelectField(choices=IMMUNIZATION_CHOICES, blank=True, default='')
@@ -192,6 +452,13 @@ class HealthService(models.Model):
 	created_date = models.DateTimeField(auto_now_add=True)
 	updated_date = models.DateTimeField(auto_now=True)
 
+	class Meta:
+		indexes = [
+			# due_date lookups: the daily reminder candidates (due_date__in the
+			# reminder intervals) and the dashboard's overdue / due-within windows
+			models.Index(fields=['due_date', 'id'], name='healthservice_due_date_idx')
+		]
+
 	def __str__(self):
 		return f'{self.service} record for {self.child}, due on {self.due_date}'
 	def __repr__(self):
@@ -201,14 +468,14 @@ class HealthService(models.Model):
 		super().save(*args, **kwargs)
 
 		if self.status == 'complete' and self.completed_date:
+			mark_schedule_dirty([self.child_id])
 			for vaccine in self.immunizations or []:
-				vaccine_data = EPSDT_REQUIREMENTS['immunization_schedule'].get(vaccine)
-				if not vaccine_data:
+				total = IMMUNIZATION_DOSES.get(vaccine, 0)
+				if not total:
 					continue
 
-				existing = ImmunizationRecord.objects.filter(child=self.child, vaccine_name=vaccine).order_by('-dose_number').first()
-				next_dose = (existing.dose_number + 1) if existing else 1
-				total = vaccine_data.get('total_doses', 0)
+				existing = ImmunizationStatus.objects.filter(child_id=self.child_id, vaccine_name=vaccine).first()
+				next_dose = (existing.highest_dose + 1) if existing else 1
 			
 				if next_dose > total:
 					continue
@@ -228,6 +495,7 @@ class ImmunizationRecord(models.Model):
 	dose_number = models.PositiveSmallIntegerField()
 	total_doses = models.PositiveSmallIntegerField(default=0)
 	date_administered = models.DateField(null=True, blank=True)
+	updated_date = models.DateTimeField(auto_now=True)
 
 	class Meta:
 		unique_together = ('child', 'vaccine_name', 'dose_number')
@@ -236,21 +504,155 @@ class ImmunizationRecord(models.Model):
 		super().clean()
 
 		if self.date_administered and self.dose_number >1:
-			prev_dose = ImmunizationRecord.objects.filter(child=self.child, vaccine_name=self.vaccine_name, dose_number=self.dose_number-1).first()
+			status = ImmunizationStatus.objects.filter(child_id=self.child_id, vaccine_name=self.vaccine_name).first()
+			highest_dose = status.highest_dose if status else 0
+
+			if highest_dose == self.dose_number - 1:
+				prev_administered = status.last_administered is not None
+			elif highest_dose < self.dose_number - 1:
+				prev_administered = False
+			else:
+				# Editing an earlier dose: the summary only knows about the highest one
+				prev_dose = ImmunizationRecord.objects.filter(child=self.child, vaccine_name=self.vaccine_name, dose_number=self.dose_number-1).first()
+				prev_administered = bool(prev_dose and prev_dose.date_administered)
 			
-			if not prev_dose or not prev_dose.date_administered:
+			if not prev_administered:
 				raise ValidationError(f'Dose #{self.dose_number} requires dose #{self.dose_number-1} to be administered first.')
 			if self.dose_number > self.total_doses:
 				raise ValidationError(f'Dose number cannot exceed total number required')
 	
 	def save(self, *args, **kwargs):
-		if not self.pk:
+		adding = not self.pk
+		if adding:
 			self.total_doses = IMMUNIZATION_DOSES.get(self.vaccine_name, 0)
 		self.full_clean()
 		super(ImmunizationRecord, self).save(*args, **kwargs)
+		if adding:
+			mark_schedule_dirty([self.child_id])
+
+class ImmunizationStatusManager(models.Manager):
+	@transaction.atomic
+	def refresh(self, child_ids):
+		child_ids = list(child_ids)
+		latest = ImmunizationRecord.objects.filter(
+			child_id__in=child_ids
+		).order_by('child_id', 'vaccine_name', '-dose_number').distinct(
+			'child_id', 'vaccine_name'
+		).values_list('child_id', 'vaccine_name', 'dose_number', 'date_administered')
+
+		self.bulk_create(
+			[
+				self.model(child_id=child_id, vaccine_name=vaccine, highest_dose=dose_number, last_administered=date_administered)
+				for child_id, vaccine, dose_number, date_administered in latest
+			],
+			update_conflicts=True,
+			unique_fields=['child', 'vaccine_name'],
+			update_fields=['highest_dose', 'last_administered']
+		)
+		self.filter(child_id__in=child_ids).exclude(
+			Exists(ImmunizationRecord.objects.filter(child_id=OuterRef('child_id'), vaccine_name=OuterRef('vaccine_name')))
+		).delete()
+
+	def recorded_doses(self, child_ids):
+		doses = defaultdict(set)
+		for child_id, vaccine, highest_dose in self.filter(
+			child_id__in=child_ids
+		).values_list('child_id', 'vaccine_name', 'highest_dose'):
+			doses[child_id].update((vaccine, dose_number) for dose_number in range(1, highest_dose + 1))
+		return doses
+
+class ImmunizationStatus(models.Model):
+	# Highest recorded dose per (child, vaccine), kept in step with
+	# ImmunizationRecord by c2c.signals and the bulk write paths.
+	objects = ImmunizationStatusManager()
+	child = models.ForeignKey(Child, on_delete=models.CASCADE, related_name='immunization_statuses')
+	vaccine_name = models.CharField(choices=IMMUNIZATION_CHOICES)
+	highest_dose = models.PositiveSmallIntegerField()
+	last_administered = models.DateField(null=True, blank=True)
+
+	class Meta:
+		verbose_name_plural = 'immunization statuses'
+		unique_together = ('child', 'vaccine_name')
 		
+ACCESS_ROLE_CHOICES = [('Caseworker', 'Caseworker'), ('FosterParent', 'FosterParent')]
+
+class ChildAccessManager(models.Manager):
+	@transaction.atomic
+	def rebuild(self, child_ids=None):
+		# Recompute access rows from open cases and active placements, for the
+		# given children or, with None, for everyone. Returns the ids of users
+		# whose rows were replaced, so their cached scope can be dropped.
+		existing = self.all()
+		cases = Case.objects.filter(status='open', caseworker__isnull=False)
+		placements = FosterPlacement.objects.filter(end_date__isnull=True, child__isnull=False, foster_family__isnull=False)
+		if child_ids is not None:
+			child_ids = set(child_ids)
+			existing = existing.filter(child_id__in=child_ids)
+			cases = cases.filter(child_id__in=child_ids)
+			placements = placements.filter(child_id__in=child_ids)
+
+		user_ids = set(existing.values_list('user_id', flat=True))
+		existing.delete()
+		rows = [
+			self.model(user_id=caseworker_id, child_id=child_id, role='Caseworker')
+			for child_id, caseworker_id in cases.values_list('child_id', 'caseworker_id')
+		]
+		for child_id, parent1_id, parent2_id in placements.values_list('child_id', 'foster_family__parent1_id', 'foster_family__parent2_id'):
+			rows.extend(
+				self.model(user_id=parent_id, child_id=child_id, role='FosterParent')
+				for parent_id in (parent1_id, parent2_id) if parent_id is not None
+			)
+		self.bulk_create(rows, ignore_conflicts=True)
+		return user_ids | {row.user_id for row in rows}
+
+class ChildAccess(models.Model):
+	# Which users reach which children and in what role, kept in step with Case,
+	# FosterPlacement and FosterFamily by c2c.signals, so querysets can be scoped
+	# with a join instead of a list of child ids.
+	objects = ChildAccessManager()
+	user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='child_access')
+	child = models.ForeignKey(Child, on_delete=models.CASCADE, related_name='access')
+	role = models.CharField(choices=ACCESS_ROLE_CHOICES)
+
+	class Meta:
+		verbose_name_plural = 'child access'
+		constraints = [
+			# Also the index behind the EXISTS lookups on (user, role, child)
+			UniqueConstraint(fields=['user', 'role', 'child'], name='unique_child_access')
+		]
+
 class ReminderLog(models.Model):
 	user = models.ForeignKey(User, on_delete=models.PROTECT, null=True)
 	service = models.ForeignKey(HealthService, on_delete=models.PROTECT, null=True)
 	sent_date = models.DateTimeField()
 	status = models.CharField(choices=[('sent', 'Sent'), ('failed', 'Failed')], default='sent')
+
+class NotificationOutbox(models.Model):
+	# Rendered reminder digests waiting for delivery. The daily job only inserts
+	# rows; drain_notification_outbox() claims them (pending -> sending), sends
+	# them and records the outcome: sent, pending again for a retry, or failed
+	# once NOTIFICATION_OUTBOX_MAX_ATTEMPTS is reached.
+	user = models.ForeignKey(User, on_delete=models.PROTECT, null=True)
+	recipient = models.EmailField()
+	subject = models.CharField(max_length=255)
+	body = models.TextField()
+	services = models.ManyToManyField(HealthService, blank=True)
+	digest_date = models.DateField()
+	status = models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending')
+	attempts = models.PositiveSmallIntegerField(default=0)
+	created_date = models.DateTimeField(auto_now_add=True)
+	claimed_date = models.DateTimeField(null=True, blank=True)
+	sent_date = models.DateTimeField(null=True, blank=True)
+
+	class Meta:
+		verbose_name_plural = 'notification outbox'
+		constraints = [
+			UniqueConstraint(fields=['user', 'digest_date'], name='unique_daily_digest')
+		]
+		indexes = [
+			models.Index(fields=['id'], condition=Q(status='pending'), name='outbox_pending_idx'),
+			models.Index(fields=['claimed_date'], condition=Q(status='sending'), name='outbox_sending_idx'),
+		]
+
+	def __str__(self):
+		return f'{self.subject} to {self.recipient} ({self.status})'
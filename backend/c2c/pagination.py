@@ -0,0 +1,16 @@
+from rest_framework.pagination import CursorPagination
+
+
+class OrderedCursorPagination(CursorPagination):
+	# Keyset pagination over each viewset's `ordering`. DRF encodes only the
+	# first field in the cursor and steps over ties with an offset capped at
+	# offset_cutoff, so that field must be indexed, unique and never updated
+	# (the pk, or the pk descending); clients sort by anything else themselves.
+	# Page size defaults to REST_FRAMEWORK['PAGE_SIZE'], overridable per request.
+	ordering = ('id',)
+	page_size_query_param = 'page_size'
+	max_page_size = 1000
+
+	def get_ordering(self, request, queryset, view):
+		self.ordering = getattr(view, 'ordering', None) or self.ordering
+		return super().get_ordering(request, queryset, view)
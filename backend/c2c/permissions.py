@@ -1,7 +1,7 @@
 from rest_framework.permissions import DjangoModelPermissions
 from .models import Child, Case, FosterFamily, FosterPlacement, HealthService, ImmunizationRecord, ReminderLog
 from django.contrib.auth.models import User
-from .mixins import get_user_role, get_accessible_child_ids
+from .mixins import get_child_access, get_request_access
 
 
 class RoleBasedPermission(DjangoModelPermissions):
@@ -16,15 +16,13 @@ class RoleBasedPermission(DjangoModelPermissions):
 	}
 	
 	def has_object_permission(self, request, view, obj):
-		role = get_user_role(request.user)
+		role, child_ids = get_request_access(request)
 
 		if role == 'Supervisor':
 			return True
 		if role not in ('Caseworker', 'FosterParent'):
 			return False
 
-		child_ids = get_accessible_child_ids(request.user)
-
 		if isinstance(obj, Child):
 			return obj.id in child_ids
 		if isinstance(obj, (Case, HealthService, ImmunizationRecord, FosterPlacement)):
@@ -35,15 +33,31 @@ class RoleBasedPermission(DjangoModelPermissions):
 		if isinstance(obj, FosterFamily):
 			if role == 'Caseworker':
 				return True
-			return obj.parent1 == request.user or obj.parent2 == request.user
+			return request.user.pk in (obj.parent1_id, obj.parent2_id)
 		
 		if isinstance(obj, User):
 			if role == 'Caseworker':
 				return True
 			if role == 'FosterParent':
 				return Case.objects.filter(
-					child_id__in=child_ids, caseworker=obj, status='open'
+					child_id__in=get_child_access(request.user, role).values('child_id'), caseworker=obj, status='open'
 				).exists()
 		
 		
-		return False
\ No newline at end of file
+		return False
+
+
+class BulkChangePermission(RoleBasedPermission):
+	# Bulk actions POST a batch of edits to existing rows
+	perms_map = {
+		**RoleBasedPermission.perms_map,
+		'POST': ['%(app_label)s.change_%(model_name)s'],
+	}
+
+
+class IntakePermission(RoleBasedPermission):
+	# Intake creates children with their placements and cases
+	perms_map = {
+		**RoleBasedPermission.perms_map,
+		'POST': ['c2c.add_child', 'c2c.add_fosterplacement', 'c2c.add_case'],
+	}
@@ -0,0 +1,21 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+
+
+_encoder = JSONRenderer.encoder_class()
+
+def dumps(data, indent=False):
+	# orjson handles dicts, lists, strings, numbers, dates and UUIDs natively;
+	# anything else (Decimal, lazy strings, querysets) falls back to DRF's encoder.
+	option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+	return orjson.dumps(data, default=_encoder.default, option=option)
+
+
+class ORJSONRenderer(JSONRenderer):
+	# Drop-in for JSONRenderer, several times faster on large serializer output.
+	# Output is always compact UTF-8 unless the client asks for an indent.
+
+	def render(self, data, accepted_media_type=None, renderer_context=None):
+		if data is None:
+			return b''
+		return dumps(data, indent=bool(self.get_indent(accepted_media_type, renderer_context or {})))
@@ -1,10 +1,35 @@
+import time
 from rest_framework import serializers
 from django.contrib.auth.models import User, Group
 from .models import Case, Child, FosterFamily, FosterPlacement, HealthService, ReminderLog, ImmunizationRecord
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework.permissions import SAFE_METHODS
+from .mixins import get_query_list, get_role_for_groups
 from .constants import IMMUNIZATION_DOSES, SERVICE_CHOICES, IMMUNIZATION_CHOICES
 
-class UserSerializer(serializers.ModelSerializer):
+class SparseFieldsetMixin:
+	# On reads, ?fields=a,b trims each top-level row to those fields and
+	# ?expand=child nests the related objects named in expandable_fields,
+	# which are otherwise serialized as ids.
+	expandable_fields = {}
+
+	def get_fields(self):
+		fields = super().get_fields()
+		request = self.context.get('request')
+		top_level = self.parent is None or (isinstance(self.parent, serializers.ListSerializer) and self.parent.parent is None)
+		if request is None or request.method not in SAFE_METHODS or not top_level:
+			return fields
+
+		for name in get_query_list(request, 'expand') & self.expandable_fields.keys():
+			fields[name] = self.expandable_fields[name](read_only=True)
+		requested = get_query_list(request, 'fields')
+		if requested:
+			fields = {name: field for name, field in fields.items() if name in requested}
+		return fields
+
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
 	groups = serializers.PrimaryKeyRelatedField(queryset=Group.objects.all(), many=True, required=True)
 
 	class Meta:
@@ -18,20 +43,44 @@ class UserSerializer(serializers.ModelSerializer):
 		user.groups.set(groups)
 		return user
 
+def add_role_claims(token, user):
+	groups = [group.name for group in user.groups.all()]
+	token['groups'] = groups
+	token['role'] = get_role_for_groups(groups)
+	# Sub-second issue time, compared against revocations by RoleClaimsJWTAuthentication
+	token['auth_time'] = time.time()
+	return token
+
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+	@classmethod
+	def get_token(cls, user):
+		return add_role_claims(super().get_token(user), user)
+
 	def validate(self, attrs):
 		data = super().validate(attrs)
 		user = self.user
 		data['groups'] = [group.name for group in user.groups.all()]
 		return data
 
-class ChildSerializer(serializers.ModelSerializer): 
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+	# Claims are reissued from the user's current groups, so role changes take
+	# effect at the next refresh.
+	def validate(self, attrs):
+		refresh = self.token_class(attrs['refresh'])
+		user = User.objects.filter(pk=refresh.get(api_settings.USER_ID_CLAIM)).first()
+		if not api_settings.USER_AUTHENTICATION_RULE(user):
+			raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+		return {'access': str(add_role_claims(refresh.access_token, user))}
+
+class ChildSerializer(SparseFieldsetMixin, serializers.ModelSerializer): 
 	class Meta:
 		model=Child
-		fields = '__all__'
+		exclude = ['schedule_horizon', 'schedule_dirty', 'schedule_version']
 
-class CaseSerializer(serializers.ModelSerializer):
-	child = ChildSerializer(read_only=True)
+class CaseSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+	child = serializers.PrimaryKeyRelatedField(read_only=True)
+	expandable_fields = {'child': ChildSerializer}
 	
 	class Meta:
 		model=Case
@@ -56,30 +105,66 @@ class CaseSerializer(serializers.ModelSerializer):
 		instance.save()
 		return instance	
 	
-class FosterFamilySerializer(serializers.ModelSerializer):
+class FosterFamilySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
 	class Meta:
 		model=FosterFamily
 		fields = '__all__'
 
-class FosterPlacementSerializer(serializers.ModelSerializer):
+class FosterPlacementSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
 	class Meta:
 		model=FosterPlacement
 		fields = '__all__'
 
-class HealthServiceSerializer(serializers.ModelSerializer):
-	child=ChildSerializer(read_only=True)
+class HealthServiceSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+	child = serializers.PrimaryKeyRelatedField(read_only=True)
+	expandable_fields = {'child': ChildSerializer}
 	service = serializers.MultipleChoiceField(choices=SERVICE_CHOICES)
 	immunizations = serializers.MultipleChoiceField(choices=IMMUNIZATION_CHOICES)
 	class Meta:
 		model=HealthService
 		fields = '__all__'
 
-class ReminderSerializer(serializers.ModelSerializer):
+class HealthServiceCompletionSerializer(serializers.Serializer):
+	id = serializers.IntegerField()
+	completed_date = serializers.DateField()
+
+class BulkCompleteSerializer(serializers.Serializer):
+	services = HealthServiceCompletionSerializer(many=True, allow_empty=False)
+
+	def validate_services(self, value):
+		ids = [completion['id'] for completion in value]
+		if len(ids) != len(set(ids)):
+			raise serializers.ValidationError('Each health service may only be listed once.')
+		return value
+
+class IntakeRowSerializer(serializers.Serializer):
+	# One intake row: a child, optionally with an active placement and a case
+	first_name = serializers.CharField(max_length=150)
+	last_name = serializers.CharField(max_length=150)
+	dob = serializers.DateField()
+	medications = serializers.CharField(required=False)
+	allergies = serializers.CharField(required=False)
+	foster_family = serializers.IntegerField(required=False)
+	placement_start_date = serializers.DateField(required=False)
+	caseworker = serializers.IntegerField(required=False)
+	case_start_date = serializers.DateField(required=False)
+	case_status = serializers.ChoiceField(choices=['open', 'closed'], default='open')
+
+	def validate(self, data):
+		if 'foster_family' in data and 'placement_start_date' not in data:
+			raise serializers.ValidationError({'placement_start_date': 'Required with a foster family.'})
+		if 'placement_start_date' in data and 'foster_family' not in data:
+			raise serializers.ValidationError({'foster_family': 'Required with a placement start date.'})
+		if 'caseworker' in data and 'case_start_date' not in data:
+			raise serializers.ValidationError({'case_start_date': 'Required with a caseworker.'})
+		return data
+
+class ReminderSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
 	class Meta:
 		model=ReminderLog
 		fields='__all__'
 
-class ImmunizationRecordSerializer(serializers.ModelSerializer):
+class ImmunizationRecordSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
 	class Meta:
 		model=ImmunizationRecord
 		fields='__all__'
@@ -89,3 +174,14 @@ class ImmunizationRecordSerializer(serializers.ModelSerializer):
 		if data.get('dose_number', 0) > total:
 			raise serializers.ValidationError('Dose number cannot exceed required doses.')
 		return data
+
+class ScheduleForecastSerializer(serializers.Serializer):
+	id = serializers.IntegerField(allow_null=True)
+	service = serializers.ListField(child=serializers.CharField())
+	immunizations = serializers.ListField(child=serializers.CharField())
+	due_date = serializers.DateField()
+	status = serializers.CharField()
+	projected = serializers.SerializerMethodField()
+
+	def get_projected(self, obj):
+		return obj.pk is None
@@ -0,0 +1,81 @@
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_save
+from django.dispatch import receiver
+from .cache import bump_response_generation, invalidate_access, invalidate_group_permissions, revoke_tokens
+from .models import Case, Child, ChildAccess, FosterFamily, HealthService, FosterPlacement, ImmunizationRecord, ImmunizationStatus
+
+
+@receiver([post_save, post_delete], sender=ImmunizationRecord)
+def refresh_immunization_status(sender, instance, **kwargs):
+	ImmunizationStatus.objects.refresh([instance.child_id])
+
+
+# Access scope: ChildAccess rows are rebuilt for every child whose open case,
+# active placement or foster parents change, and the cached scope of each user
+# who gained or lost a row is dropped. pre_save records the previous child so a
+# reassigned case or placement also updates the child it left.
+
+def _rebuild_access(child_ids):
+	invalidate_access(ChildAccess.objects.rebuild(child_id for child_id in child_ids if child_id is not None))
+
+@receiver(pre_save, sender=Case)
+@receiver(pre_save, sender=FosterPlacement)
+def remember_previous_child(sender, instance, **kwargs):
+	instance._previous_child_ids = list(
+		sender.objects.filter(pk=instance.pk).values_list('child_id', flat=True)
+	) if instance.pk else []
+
+@receiver([post_save, post_delete], sender=Case)
+@receiver([post_save, post_delete], sender=FosterPlacement)
+def rebuild_child_access(sender, instance, **kwargs):
+	_rebuild_access([instance.child_id, *getattr(instance, '_previous_child_ids', [])])
+
+@receiver([post_save, post_delete], sender=FosterFamily)
+def rebuild_family_access(sender, instance, **kwargs):
+	if kwargs.get('created'):
+		return
+	_rebuild_access(
+		FosterPlacement.objects.filter(foster_family_id=instance.pk, end_date__isnull=True).values_list('child_id', flat=True)
+	)
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_group_access(sender, instance, action, reverse, pk_set, **kwargs):
+	# Group changes also revoke the users' access tokens, whose role claims are now stale
+	if action in ('post_add', 'post_remove'):
+		user_ids = pk_set if reverse else [instance.pk]
+	elif action == 'pre_clear':
+		user_ids = list(instance.user_set.values_list('id', flat=True)) if reverse else [instance.pk]
+	else:
+		return
+	invalidate_access(user_ids)
+	revoke_tokens(user_ids)
+
+@receiver(post_save, sender=User)
+def revoke_inactive_user_tokens(sender, instance, **kwargs):
+	if not instance.is_active:
+		revoke_tokens([instance.pk])
+
+@receiver(post_delete, sender=User)
+def revoke_deleted_user_tokens(sender, instance, **kwargs):
+	revoke_tokens([instance.pk])
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_changed_group_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+	if action not in ('post_add', 'post_remove', 'pre_clear'):
+		return
+	if not reverse:
+		invalidate_group_permissions([instance.name])
+	elif action == 'pre_clear':
+		invalidate_group_permissions(instance.group_set.values_list('name', flat=True))
+	else:
+		invalidate_group_permissions(Group.objects.filter(pk__in=pk_set).values_list('name', flat=True))
+
+@receiver([post_save, post_delete], sender=Group)
+def invalidate_saved_group_permissions(sender, instance, **kwargs):
+	invalidate_group_permissions([instance.name])
+
+@receiver([post_save, post_delete], sender=Child)
+@receiver([post_save, post_delete], sender=Case)
+@receiver([post_save, post_delete], sender=HealthService)
+def invalidate_cached_responses(sender, instance, **kwargs):
+	bump_response_generation(sender)
@@ -1,78 +1,250 @@
-from django_q.tasks import async_task, schedule
+from django_q.tasks import async_task, schedule, fetch_group
 from django.utils import timezone
 from dateutil.relativedelta import relativedelta
 from datetime import timedelta
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage
 from django.conf import settings
-from .models import Case, HealthService, ReminderLog, generate_health_services
+from django.db import connection, transaction
+from django.db.models import F, Prefetch, Q
+from .mail import reminder_sender
+from .models import Case, Child, HealthService, NotificationOutbox, ReminderLog, generate_health_services_for_children
+from uuid import uuid4
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+REMINDER_INTERVALS = [30, 14, 7]
+
+def _child_id_ranges(child_ids, shard_count):
+	shard_size = -(-len(child_ids) // shard_count)
+	return [
+		(child_ids[i], child_ids[min(i + shard_size, len(child_ids)) - 1])
+		for i in range(0, len(child_ids), shard_size)
+	]
+
+def _children_due_for_scheduling(reference_date):
+	# Only children whose inputs changed or whose watermark falls inside the
+	# 90 day generation window need to be looked at.
+	return Child.objects.filter(cases__status='open').filter(
+		Q(schedule_dirty=True)
+		| Q(schedule_horizon__isnull=True)
+		| Q(schedule_horizon__lte=reference_date + timedelta(days=90))
+	)
+
+def generate_health_services_for_shard(first_child_id, last_child_id, reference_date, shard_count=None):
+	# shard_count only travels with the task for summarize_health_service_shards
+	children = _children_due_for_scheduling(reference_date).filter(id__range=(first_child_id, last_child_id))
+	return generate_health_services_for_children(children, reference_date)
+
 def generate_upcoming_health_services():
+	# Queues the shards and returns: the combined counts are logged by the
+	# shards' hook, so no worker is tied up waiting for the others.
 	today = timezone.now().date()
-	active_cases = Case.objects.filter(status='open')
+	child_ids = list(
+		_children_due_for_scheduling(today).order_by('id').values_list('id', flat=True)
+	)
+	if not child_ids:
+		return 'Created 0 new well_child and 0 new dental HealthService records.'
+
+	shards = _child_id_ranges(child_ids, settings.HEALTHSERVICE_SHARDS)
+	group_id = f'healthservice-shards-{today.isoformat()}-{uuid4().hex[:8]}'
+	for first_child_id, last_child_id in shards:
+		async_task(
+			'c2c.tasks.generate_health_services_for_shard',
+			first_child_id, last_child_id, today,
+			shard_count=len(shards),
+			group=group_id,
+			hook='c2c.tasks.summarize_health_service_shards'
+		)
+	return f'Queued {len(shards)} health service shards for {len(child_ids)} children (group {group_id})'
+
+def summarize_health_service_shards(task):
+	# Result hook, run by the cluster's monitor as each shard is saved. The
+	# last shard of the group to finish logs the combined counts.
+	finished = fetch_group(task.group, failures=True) or []
+	shard_count = task.kwargs['shard_count']
+	if len(finished) < shard_count:
+		return None
+
 	total_wc = 0
 	total_dental = 0
+	for shard in finished:
+		if shard.success:
+			wc, dental = shard.result
+			total_wc += wc
+			total_dental += dental
+
+	summary = f'Created {total_wc} new well_child and {total_dental} new dental HealthService records.'
+	failed = len(finished) - sum(1 for shard in finished if shard.success)
+	if failed:
+		logger.error(f'{failed} of {shard_count} health service shards failed (group {task.group})')
+		summary += f' {failed} of {shard_count} shards did not complete.'
+	logger.info(f'{summary} (group {task.group})')
+	return summary
 
-	for case in active_cases:
-		wc, dental = generate_health_services(case.child, today)
-		total_wc += wc
-		total_dental += dental
-		
-	return f'Created {total_wc} new well_child and {total_dental} new dental HealthService records.'
+def _reminder_candidates(today):
+	# Pending services due at any reminder interval, with the child's open case,
+	# caseworker and foster parents resolved up front (two queries in total).
+	open_cases = Case.objects.filter(status='open').select_related(
+		'caseworker', 'placement__foster_family__parent1', 'placement__foster_family__parent2'
+	)
+	return HealthService.objects.filter(
+		status='pending',
+		due_date__in=[today + timedelta(days=interval) for interval in REMINDER_INTERVALS]
+	).select_related('child').prefetch_related(
+		Prefetch('child__cases', queryset=open_cases, to_attr='open_cases')
+	).order_by('-due_date', 'id')
 
 def send_health_reminders():
 	today = timezone.now().date()
-	intervals = [30, 14, 7]
+	digests = {}
+
+	for service in _reminder_candidates(today):
+		if not service.child.open_cases:
+			continue
+		case = service.child.open_cases[0]
+
+		recipients = []
+		if case.caseworker:
+			recipients.append(case.caseworker)
+		if case.placement and case.placement.foster_family:
+			family = case.placement.foster_family
+			if family.parent1:
+				recipients.append(family.parent1)
+			if family.parent2:
+				recipients.append(family.parent2)
+
+		for person in recipients:
+			digests.setdefault(person.id, (person, []))[1].append(service)
+
+	# One email per recipient per day, covering every service due at an interval.
+	# Recipients already holding today's digest (a retried run) are skipped.
+	already_queued = set(
+		NotificationOutbox.objects.filter(digest_date=today, user_id__in=digests).values_list('user_id', flat=True)
+	)
+	entries = []
+	for person, services in digests.values():
+		if person.id in already_queued:
+			continue
+		lines = [
+			f'- {service.child.first_name} {service.child.last_name}: {", ".join(service.service)} due in {(service.due_date - today).days} days on {service.due_date}.'
+			for service in services
+		]
+		entries.append(NotificationOutbox(
+			user=person,
+			recipient=person.email,
+			subject='Health Service Reminder' if len(services) == 1 else f'Health Service Reminders ({len(services)} upcoming)',
+			body='Upcoming health services:\n' + '\n'.join(lines),
+			digest_date=today
+		))
+
+	with transaction.atomic():
+		NotificationOutbox.objects.bulk_create(entries)
+		NotificationOutbox.services.through.objects.bulk_create([
+			NotificationOutbox.services.through(notificationoutbox_id=entry.id, healthservice_id=service.id)
+			for entry in entries
+			for service in digests[entry.user_id][1]
+		])
+
+	for _ in range(settings.NOTIFICATION_OUTBOX_DRAINERS):
+		async_task('c2c.tasks.drain_notification_outbox')
+	return f'Queued {len(entries)} reminders'
+
+# Session-level Postgres advisory locks (OUTBOX_DRAINER_LOCK, slot) cap how many
+# drainers run at once, however they were started. A dead worker's connection
+# closes and frees its slot.
+OUTBOX_DRAINER_LOCK = 0x0c2c
+
+def _acquire_drainer_slot():
+	with connection.cursor() as cursor:
+		for slot in range(settings.NOTIFICATION_OUTBOX_DRAINERS):
+			cursor.execute('SELECT pg_try_advisory_lock(%s, %s)', [OUTBOX_DRAINER_LOCK, slot])
+			if cursor.fetchone()[0]:
+				return slot
+	return None
+
+def _release_drainer_slot(slot):
+	with connection.cursor() as cursor:
+		cursor.execute('SELECT pg_advisory_unlock(%s, %s)', [OUTBOX_DRAINER_LOCK, slot])
+
+def _claimable_outbox():
+	# Pending rows never tried, or last tried over NOTIFICATION_OUTBOX_RETRY_DELAY ago
+	retry_before = timezone.now() - timedelta(seconds=settings.NOTIFICATION_OUTBOX_RETRY_DELAY)
+	return NotificationOutbox.objects.filter(
+		Q(claimed_date__isnull=True) | Q(claimed_date__lt=retry_before), status='pending'
+	)
+
+def _claim_outbox_batch():
+	# Flips a batch from pending to sending and commits, so the rows are ours
+	# without holding locks (or a transaction) while they are sent.
+	with transaction.atomic():
+		ids = list(
+			_claimable_outbox().select_for_update(skip_locked=True)
+			.order_by('id')
+			.values_list('id', flat=True)[:settings.NOTIFICATION_OUTBOX_BATCH_SIZE]
+		)
+		NotificationOutbox.objects.filter(id__in=ids).update(
+			status='sending', claimed_date=timezone.now(), attempts=F('attempts') + 1
+		)
+	return list(NotificationOutbox.objects.filter(id__in=ids).order_by('id').prefetch_related('services'))
+
+def _record_outbox_results(batch, results):
+	# Failed rows with attempts left go back to pending for a later retry;
+	# ReminderLog records the outcome of every attempt.
+	now = timezone.now()
+	for entry, sent in zip(batch, results):
+		if sent:
+			entry.status = 'sent'
+		else:
+			entry.status = 'pending' if entry.attempts < settings.NOTIFICATION_OUTBOX_MAX_ATTEMPTS else 'failed'
+		entry.sent_date = now if sent else None
+	with transaction.atomic():
+		NotificationOutbox.objects.bulk_update(batch, ['status', 'sent_date'])
+		ReminderLog.objects.bulk_create([
+			ReminderLog(user_id=entry.user_id, service=service, sent_date=now, status='sent' if sent else 'failed')
+			for entry, sent in zip(batch, results)
+			for service in entry.services.all()
+		])
+
+def drain_notification_outbox():
+	# Claims pending rows in batches, sends each batch outside any transaction
+	# and then records its outcome. Rows are only ever sent by the drainer that
+	# claimed them; a drainer that dies mid-batch leaves its claims to go back
+	# to pending after NOTIFICATION_OUTBOX_CLAIM_TIMEOUT, the one case in which
+	# a digest can go out twice. Drainers stop claiming once their time budget
+	# is spent and hand the rest of the backlog to a fresh task. Both failed
+	# sends and released claims count towards NOTIFICATION_OUTBOX_MAX_ATTEMPTS.
+	slot = _acquire_drainer_slot()
+	if slot is None:
+		return 'Sent 0 reminders, 0 failures (all drainer slots busy)'
+
 	sent_count = 0
 	failed_count = 0
-
-	for interval in intervals:
-		target_date = today + timedelta(days=interval)
-		services = HealthService.objects.filter(
-			status = 'pending',
-			due_date = target_date
+	deadline = time.monotonic() + settings.NOTIFICATION_OUTBOX_DRAIN_BUDGET
+	try:
+		stale = NotificationOutbox.objects.filter(
+			status='sending', claimed_date__lt=timezone.now() - timedelta(seconds=settings.NOTIFICATION_OUTBOX_CLAIM_TIMEOUT)
 		)
-	
-		for service in services:
-			case = service.child.cases.filter(status='open').first()
-			if not case:
-				continue
-
-			recipients = []
-			if case.caseworker:
-				recipients.append(case.caseworker)
-			if case.placement and case.placement.foster_family:
-				family = case.placement.foster_family
-				if family.parent1:
-					recipients.append(family.parent1)
-				if family.parent2:
-					recipients.append(family.parent2)
-
-			if not recipients:
-				continue
-
-			subject = f'Health Service Reminder'
-			message = f'Health Service Reminder for {case.child.first_name} {case.child.last_name}. The {", ".join(service.service)} is due in {interval} days on {service.due_date}.'
-
-			for person in recipients:
-				try:
-					send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [person.email], fail_silently=False)
-					ReminderLog.objects.create(
-						user = person,
-						service = service,
-						sent_date = timezone.now(),
-						status = 'sent'
-					)
-					sent_count += 1
-				except Exception as e:
-					ReminderLog.objects.create(
-						user = person,
-						service = service,
-						sent_date = timezone.now(),
-						status = 'failed'
-					)
-					failed_count += 1
-					logger.error(f'Email failed for service {service.id}: {str(e)}')
+		stale.filter(attempts__gte=settings.NOTIFICATION_OUTBOX_MAX_ATTEMPTS).update(status='failed')
+		stale.update(status='pending')
+
+		rate_limit = settings.REMINDER_EMAIL_RATE_LIMIT / settings.NOTIFICATION_OUTBOX_DRAINERS
+		with reminder_sender(rate_limit) as send:
+			while time.monotonic() < deadline:
+				batch = _claim_outbox_batch()
+				if not batch:
+					break
+				results = send([
+					EmailMessage(entry.subject, entry.body, settings.DEFAULT_FROM_EMAIL, [entry.recipient])
+					for entry in batch
+				])
+				_record_outbox_results(batch, results)
+				sent_count += sum(results)
+				failed_count += len(results) - sum(results)
+	finally:
+		_release_drainer_slot(slot)
+
+	if time.monotonic() >= deadline and _claimable_outbox().exists():
+		async_task('c2c.tasks.drain_notification_outbox')
 	return f'Sent {sent_count} reminders, {failed_count} failures'
@@ -1,3 +1,5 @@
 from .auth_tests import *
 from .epsdt_tests import *
+from .intake_tests import *
+from .mail_tests import *
 from .tasks_tests import *
\ No newline at end of file
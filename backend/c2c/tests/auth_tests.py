@@ -1,8 +1,19 @@
-from django.test import TestCase
+import gzip
+import json
+from io import StringIO
+from django.conf import settings
+from django.test import TestCase, override_settings
 from django.contrib.auth.models import User, Group
 from django.utils import timezone
+from datetime import timedelta
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.management import call_command
-from c2c.models import Case, Child, FosterFamily, FosterPlacement, HealthService, ReminderLog
+from django.db import connection
+from django.db.models.functions import Lower
+from django.test.utils import CaptureQueriesContext
+from c2c.checks import check_response_cache, check_token_revocation_cache
+from c2c.models import Case, Child, ChildAccess, FosterFamily, FosterPlacement, HealthService, ReminderLog
 from rest_framework.test import APIClient
 from rest_framework import status
 
@@ -81,7 +92,7 @@ class RbacApiTestCase(TestCase):
         # Test listing all children
         response = self.client.get('/api/children/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertGreater(len(response.data), 0)  # Should see at least the test child
+        self.assertGreater(len(response.data['results']), 0)  # Should see at least the test child
 
         # Test creating a new child
         new_child_data = {'first_name': 'New', 'last_name': 'Child', 'dob': '2020-01-01'}
@@ -94,8 +105,8 @@ class RbacApiTestCase(TestCase):
         # Test listing assigned cases
         response = self.client.get('/api/cases/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)  # Should see only their assigned case
-        self.assertEqual(response.data[0]['id'], self.case.id)
+        self.assertEqual(len(response.data['results']), 1)  # Should see only their assigned case
+        self.assertEqual(response.data['results'][0]['id'], self.case.id)
 
         # Test caseworker cannot update a case
         update_data = {'status': 'open', 'child': self.case.child.id, 'caseworker': self.caseworker_user.id}
@@ -105,16 +116,16 @@ class RbacApiTestCase(TestCase):
         # Test listing children (should see only the case's child)
         response = self.client.get('/api/children/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['id'], self.child.id)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['id'], self.child.id)
 
     def test_fosterparent_access(self):
         self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.fosterparent1_token}')
         # Test listing children in their care
         response = self.client.get('/api/children/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)  # Should see only their placed child
-        self.assertEqual(response.data[0]['id'], self.child.id)
+        self.assertEqual(len(response.data['results']), 1)  # Should see only their placed child
+        self.assertEqual(response.data['results'][0]['id'], self.child.id)
 
         # Test updating child medications with all required fields
         update_data = {
@@ -141,7 +152,7 @@ class RbacApiTestCase(TestCase):
         self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.caseworker_token}')
         response = self.client.get('/api/cases/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        case_ids = [c['id'] for c in response.data]
+        case_ids = [c['id'] for c in response.data['results']]
         self.assertNotIn(self.case2.id, case_ids)
 
     def test_caseworker_cannot_create_child(self):
@@ -165,7 +176,7 @@ class RbacApiTestCase(TestCase):
         self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.fosterparent1_token}')
         response = self.client.get('/api/children/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        child_ids = [c['id'] for c in response.data]
+        child_ids = [c['id'] for c in response.data['results']]
         self.assertNotIn(self.child2.id, child_ids)
 
     def test_unauthenticated_access_denied(self):
@@ -176,6 +187,385 @@ class RbacApiTestCase(TestCase):
             self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED,
                 f'{endpoint} accessible without authentication')
 
+    def test_access_resolved_once_per_request(self):
+        cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.caseworker_token}')
+        # The role comes from the token; the first request resolves the scope
+        # once and the next one reuses the cached scope
+        for method, payload, expected in (('get', None, 1), ('patch', {'medications': 'None'}, 0)):
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(self.client, method)(f'/api/children/{self.child.id}/', payload, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            role_queries = [q for q in queries.captured_queries if 'SELECT "auth_group"."name" FROM "auth_group"' in q['sql']]
+            scope_queries = [q for q in queries.captured_queries if 'SELECT "c2c_childaccess"."child_id"' in q['sql']]
+            self.assertEqual(len(role_queries), 0, f'{method} resolved the role {len(role_queries)} times')
+            self.assertEqual(len(scope_queries), expected, f'{method} resolved accessible children {len(scope_queries)} times')
+
+    def test_list_cursor_pagination(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.supervisor_token}')
+        expected = list(HealthService.objects.order_by('id').values_list('id', flat=True))
+        self.assertGreater(len(expected), 2)
+
+        seen, url = [], '/api/health-services/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen.extend(service['id'] for service in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, expected)
+
+    def test_cursor_pagination_with_shared_due_dates(self):
+        # More rows on one due date than CursorPagination's offset_cutoff
+        due_date = timezone.now().date() + timedelta(days=30)
+        HealthService.objects.bulk_create([
+            HealthService(child=self.child, service=['dental'], due_date=due_date, status='pending') for _ in range(1100)
+        ])
+        expected = list(HealthService.objects.order_by('id').values_list('id', flat=True))
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.supervisor_token}')
+        seen, url = [], '/api/health-services/?page_size=100&fields=id'
+        for _ in range(len(expected) // 100 + 2):
+            if not url:
+                break
+            response = self.client.get(url)
+            seen.extend(service['id'] for service in response.data['results'])
+            url = response.data['next']
+        self.assertIsNone(url)
+        self.assertEqual(seen, expected)
+
+    def test_child_search(self):
+        Child.objects.create(first_name='Anna', last_name='Smith', dob='2015-03-01')
+        Child.objects.create(first_name='Annabel', last_name='Smythe', dob='2016-07-15')
+        Child.objects.create(first_name='Ben', last_name='Goldsmith', dob='2015-03-01')
+
+        def names(token, query):
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+            response = self.client.get(f'/api/children/?{query}')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return sorted(c['last_name'] for c in response.data['results'])
+
+        self.assertEqual(names(self.supervisor_token, 'last_name=SM'), ['Smith', 'Smythe'])
+        self.assertEqual(names(self.supervisor_token, 'last_name=smith'), ['Smith'])
+        self.assertEqual(names(self.supervisor_token, 'first_name=ann&last_name=smy'), ['Smythe'])
+        self.assertEqual(names(self.supervisor_token, 'dob=2015-03-01'), ['Goldsmith', 'Smith'])
+        self.assertEqual(names(self.supervisor_token, 'dob_after=2015-03-02&dob_before=2016-12-31'), ['Smythe'])
+        # Search stays within the caller's scope
+        self.assertEqual(names(self.caseworker_token, 'last_name=c'), ['Child'])
+        self.assertEqual(names(self.caseworker_token, 'last_name=sm'), [])
+
+        response = self.client.get('/api/children/?dob=03/01/2015')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Prefix lookups can be answered from the lower() index
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = Child.objects.alias(last_name_lower=Lower('last_name')).filter(last_name_lower__startswith='sm').explain()
+        self.assertIn('child_last_name_lower_idx', plan)
+
+    def test_dashboard_summary(self):
+        today = timezone.now().date()
+        child3 = Child.objects.create(first_name='Cal', last_name='Cole', dob='2018-01-01')
+        for offset, service_status in ((-3, 'pending'), (5, 'pending'), (20, 'pending'), (40, 'pending'), (-1, 'complete')):
+            HealthService.objects.create(
+                child=child3, service=['dental'], due_date=today + timedelta(days=offset), status=service_status,
+                completed_date=today if service_status == 'complete' else None
+            )
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.supervisor_token}')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/dashboard/summary/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len([q for q in queries.captured_queries if 'c2c_healthservice' in q['sql']]), 1)
+
+        rows = {row['id']: row for row in response.data['children']}
+        self.assertEqual(rows[child3.id], {
+            'id': child3.id, 'first_name': 'Cal', 'last_name': 'Cole', 'next_due_date': today + timedelta(days=5),
+            'overdue': 1, 'due_7': 1, 'due_14': 1, 'due_30': 2, 'completed_this_month': 1,
+        })
+        for name, total in response.data['totals'].items():
+            self.assertEqual(total, sum(row[name] for row in rows.values()))
+
+        # Caseworkers only see their own caseload
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.caseworker_token}')
+        response = self.client.get('/api/dashboard/summary/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['id'] for row in response.data['children']], [self.child.id])
+
+    def test_sparse_fields_and_expand(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.caseworker_token}')
+        self.client.get('/api/children/')
+
+        response = self.client.get('/api/health-services/')
+        self.assertEqual(response.data['results'][0]['child'], self.child.id)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/health-services/?fields=id,due_date,child')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'due_date', 'child'})
+        sql = next(q['sql'] for q in queries.captured_queries if 'FROM "c2c_healthservice"' in q['sql'])
+        self.assertNotIn('"c2c_healthservice"."immunizations"', sql)
+        self.assertNotIn('"c2c_child"', sql.split(' WHERE ')[0])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/health-services/?fields=id,child&expand=child')
+        self.assertEqual(response.data['results'][0]['child']['last_name'], self.child.last_name)
+        # Joined into the page query (and the ETag aggregate), never loaded per row
+        self.assertFalse([q for q in queries.captured_queries if 'FROM "c2c_child"' in q['sql']])
+
+        response = self.client.get(f'/api/cases/{self.case.id}/?expand=child')
+        self.assertEqual(response.data['child']['id'], self.child.id)
+        self.assertEqual(response.data['caseworker'], self.caseworker_user.id)
+
+    def test_conditional_get(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.caseworker_token}')
+        response = self.client.get('/api/health-services/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertNotIn('Last-Modified', response)
+
+        # Bypass the response cache to check the aggregate-only path
+        caches['responses'].clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/health-services/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(len([q for q in queries.captured_queries if 'c2c_healthservice' in q['sql']]), 1)
+
+        # A different representation, an update or a delete each change the validator
+        self.assertEqual(self.client.get('/api/health-services/?fields=id', HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+        self.health_service.status = 'complete'
+        self.health_service.save()
+        response = self.client.get('/api/health-services/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        HealthService.objects.filter(child=self.child).exclude(pk=self.health_service.pk).delete()
+        self.assertEqual(self.client.get('/api/health-services/', HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+        since = 'Fri, 01 Jan 2100 00:00:00 GMT'
+        self.assertEqual(self.client.get('/api/health-services/', HTTP_IF_MODIFIED_SINCE=since).status_code, status.HTTP_200_OK)
+
+        # A reassignment that swaps in rows with the same count and latest
+        # updated_date still changes the validator
+        child3 = Child.objects.create(first_name='Little', last_name='Bo', dob=timezone.now().date())
+        other = HealthService.objects.create(child=child3, service=['dental'], due_date=timezone.now().date(), status='pending')
+        HealthService.objects.filter(pk__in=[self.health_service.pk, other.pk]).update(updated_date=timezone.now())
+        etag = self.client.get('/api/health-services/')['ETag']
+        self.case.child = child3
+        self.case.save()
+        response = self.client.get('/api/health-services/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([s['id'] for s in response.data['results']], [other.id])
+        self.case.child = self.child
+        self.case.save()
+
+        # Detail endpoints work the same way
+        response = self.client.get(f'/api/children/{self.child.id}/')
+        etag = response['ETag']
+        self.assertEqual(self.client.get(f'/api/children/{self.child.id}/', HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(
+            self.client.get(f'/api/children/{self.child.id}/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code,
+            status.HTTP_304_NOT_MODIFIED
+        )
+        self.client.patch(f'/api/children/{self.child.id}/', {'allergies': 'Peanuts'}, format='json')
+        self.assertEqual(self.client.get(f'/api/children/{self.child.id}/', HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(f'/api/children/{self.child2.id}/').status_code, status.HTTP_404_NOT_FOUND)
+
+        # Editing an expanded child changes the validators of the rows nesting it
+        url = f'/api/cases/{self.case.id}/?expand=child'
+        etag = self.client.get(url)['ETag']
+        list_etag = self.client.get('/api/cases/?expand=child')['ETag']
+        self.child.medications = 'Ibuprofen'
+        self.child.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['child']['medications'], 'Ibuprofen')
+        self.assertEqual(self.client.get('/api/cases/?expand=child', HTTP_IF_NONE_MATCH=list_etag).status_code, status.HTTP_200_OK)
+
+    def test_response_cache(self):
+        caches['responses'].clear()
+        other_supervisor = User.objects.create_user(username='supervisor2', password='testpass123')
+        other_supervisor.groups.add(Group.objects.get(name='Supervisor'))
+        other_token = self._login_user('supervisor2', 'testpass123')['access']
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.supervisor_token}')
+        first = self.client.get('/api/children/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/children/')
+        self.assertEqual(response.data, first.data)
+        self.assertEqual(response['ETag'], first['ETag'])
+        self.assertFalse([q for q in queries.captured_queries if 'c2c_child' in q['sql']])
+        self.assertEqual(self.client.get('/api/children/', HTTP_IF_NONE_MATCH=first['ETag']).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Users with the same scope share entries, other scopes do not
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {other_token}')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/api/children/').data, first.data)
+        self.assertFalse([q for q in queries.captured_queries if 'c2c_child' in q['sql']])
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.caseworker_token}')
+        self.assertEqual([c['id'] for c in self.client.get('/api/children/').data['results']], [self.child.id])
+
+        # Saves and bulk writes invalidate the rendered models' entries
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.supervisor_token}')
+        self.child.allergies = 'Peanuts'
+        self.child.save()
+        response = self.client.get(f'/api/children/{self.child.id}/')
+        self.assertEqual(response.data['allergies'], 'Peanuts')
+        services = self.client.get('/api/health-services/').data['results']
+        HealthService.objects.bulk_complete([(HealthService.objects.get(pk=self.health_service.pk), timezone.now().date())])
+        refreshed = {s['id']: s for s in self.client.get('/api/health-services/').data['results']}
+        self.assertEqual(len(refreshed), len(services))
+        self.assertEqual(refreshed[self.health_service.pk]['status'], 'complete')
+
+    def test_streamed_list(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.caseworker_token}')
+        response = self.client.get('/api/health-services/?stream=1&fields=id,due_date')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        rows = json.loads(b''.join(response.streaming_content))
+        expected = HealthService.objects.filter(child=self.child).order_by('id')
+        self.assertEqual([row['id'] for row in rows], list(expected.values_list('id', flat=True)))
+        self.assertEqual(set(rows[0]), {'id', 'due_date'})
+
+        response = self.client.get('/api/children/?stream=1', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual([row['id'] for row in json.loads(gzip.decompress(b''.join(response.streaming_content)))], [self.child.id])
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.caseworker2_token}')
+        streamed = json.loads(b''.join(self.client.get('/api/cases/?stream=1').streaming_content))
+        self.assertEqual(streamed, self.client.get('/api/cases/').data['results'])
+
+    def test_intake_upload(self):
+        upload = SimpleUploadedFile('intake.csv', (
+            'first_name,last_name,dob,caseworker,case_start_date\n'
+            f'Ana,Lopez,2019-04-02,{self.caseworker_user.id},2025-01-06\n'
+            'Test,Child,{dob}\n'.format(dob=self.child.dob.isoformat())
+        ).encode(), content_type='text/csv')
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.caseworker_token}')
+        self.assertEqual(self.client.post('/api/children/intake/', {'file': upload}).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.supervisor_token}')
+        self.client.get('/api/children/')
+        upload.seek(0)
+        response = self.client.post('/api/children/intake/', {'file': upload})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'rows': 2, 'created': 1, 'duplicates': [3], 'errors': []})
+        self.assertIn('Lopez', [c['last_name'] for c in self.client.get('/api/children/').data['results']])
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.caseworker_token}')
+        self.assertIn('Lopez', [c['last_name'] for c in self.client.get('/api/children/').data['results']])
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.supervisor_token}')
+        response = self.client.post('/api/children/intake/', {'file': SimpleUploadedFile('intake.xlsx', b'')})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_scope_filters_in_sql(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.caseworker_token}')
+        self.client.get('/api/children/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/health-services/')
+        self.assertEqual({s['id'] for s in response.data['results']}, set(HealthService.objects.filter(child=self.child).values_list('id', flat=True)))
+        sql = next(q['sql'] for q in queries.captured_queries if 'FROM "c2c_healthservice"' in q['sql'])
+        self.assertIn('EXISTS', sql)
+        self.assertNotIn(f'IN ({self.child.id})', sql)
+
+    def test_reads_authenticate_from_token_claims(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.caseworker_token}')
+        self.client.get('/api/children/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/children/{self.child.id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([q['sql'] for q in queries.captured_queries if '"auth_' in q['sql']])
+
+        # Writes still load the user
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(f'/api/children/{self.child.id}/', {'medications': 'None'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(any('FROM "auth_user"' in q['sql'] for q in queries.captured_queries))
+
+    def test_role_change_takes_effect_on_refresh(self):
+        tokens = self._login_user('supervisor1', 'testpass123')
+        with override_settings(ACCESS_TOKEN_REVOCATION=False):
+            self.supervisor_user.groups.set([self.caseworker_group])
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}')
+            self.assertEqual(len(self.client.get('/api/children/').data['results']), 2)
+
+            self.client.credentials()
+            response = self.client.post('/api/token/refresh/', {'refresh': tokens['refresh']}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+            self.assertEqual(len(self.client.get('/api/children/').data['results']), 0)
+
+    def test_revoked_tokens_rejected(self):
+        tokens = self._login_user('caseworker1', 'testpass123')
+        self.caseworker_user.is_active = False
+        self.caseworker_user.save()
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}')
+        self.assertEqual(self.client.get('/api/children/').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials()
+        response = self.client.post('/api/token/refresh/', {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        # Recovering access rows keeps revocations, and picks up writes that skipped signals
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.caseworker2_token}')
+        self.assertEqual({c['id'] for c in self.client.get('/api/children/').data['results']}, {self.child2.id})
+        Case.objects.filter(pk=self.case.pk).update(caseworker=self.caseworker2_user)
+        call_command('rebuild_child_access', stdout=StringIO())
+        self.assertEqual({c['id'] for c in self.client.get('/api/children/').data['results']}, {self.child.id, self.child2.id})
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}')
+        self.assertEqual(self.client.get('/api/children/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revocation_cache_check(self):
+        self.assertEqual([warning.id for warning in check_token_revocation_cache(None)], ['c2c.W001'])
+        with override_settings(ACCESS_TOKEN_REVOCATION=False):
+            self.assertEqual(check_token_revocation_cache(None), [])
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp/c2c-check-cache'}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(check_token_revocation_cache(None), [])
+
+    def test_response_cache_check(self):
+        self.assertEqual(check_response_cache(None), [])
+        local = {**settings.CACHES, 'responses': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(CACHES=local):
+            self.assertEqual([warning.id for warning in check_response_cache(None)], ['c2c.W002'])
+
+    def test_access_scope_invalidated_on_change(self):
+        def child_ids(token):
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+            response = self.client.get('/api/children/')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return {c['id'] for c in response.data['results']}
+
+        self.assertEqual(child_ids(self.caseworker_token), {self.child.id})
+        self.assertEqual(child_ids(self.caseworker2_token), {self.child2.id})
+        self.assertEqual(child_ids(self.fosterparent1_token), {self.child.id})
+
+        # Reassigning a case moves the child between both caseworkers' scopes
+        self.case.caseworker = self.caseworker2_user
+        self.case.save()
+        self.assertEqual(child_ids(self.caseworker_token), set())
+        self.assertEqual(child_ids(self.caseworker2_token), {self.child.id, self.child2.id})
+
+        # Ending a placement removes the child from the family's scope
+        self.placement.end_date = timezone.now().date()
+        self.placement.save()
+        self.assertEqual(child_ids(self.fosterparent1_token), set())
+
+        # Signal-maintained access rows match a full rebuild
+        synced = set(ChildAccess.objects.values_list('user_id', 'child_id', 'role'))
+        ChildAccess.objects.rebuild()
+        self.assertEqual(synced, set(ChildAccess.objects.values_list('user_id', 'child_id', 'role')))
+        self.assertEqual(synced, {
+            (self.caseworker2_user.id, self.child.id, 'Caseworker'),
+            (self.caseworker2_user.id, self.child2.id, 'Caseworker'),
+        })
+
+        # Leaving a group revokes outstanding tokens and drops the role
+        self.caseworker2_user.groups.remove(self.caseworker_group)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.caseworker2_token}')
+        self.assertEqual(self.client.get('/api/children/').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self._login_user("caseworker2", "testpass123")["access"]}')
+        self.assertEqual(self.client.get('/api/children/').status_code, status.HTTP_403_FORBIDDEN)
+
     def tearDown(self):
         self.client.credentials() 
         HealthService.objects.all().delete()
@@ -1,9 +1,14 @@
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
 from django.contrib.auth.models import User, Group
 from django.utils import timezone
-from c2c.models import Case, Child, FosterFamily, FosterPlacement, HealthService, ImmunizationRecord
-from datetime import timedelta
+from django.core.management import call_command
+from rest_framework.test import APIClient
+from c2c.models import Case, Child, FosterFamily, FosterPlacement, HealthService, ImmunizationRecord, ImmunizationStatus, generate_health_services_for_children, calculate_age_in_months, calculate_ages_in_months, mark_schedule_dirty
+from c2c.constants import EPSDT_REQUIREMENTS, IMMUNIZATIONS_BY_AGE, WELL_CHILD_AGES
+from datetime import date, timedelta
+from io import StringIO
 from dateutil.relativedelta import relativedelta
+from unittest.mock import patch
 
 class EPSDTTestCase(TestCase):
 	# Taken from auth_tests.py for consistency
@@ -111,6 +116,99 @@ class EPSDTTestCase(TestCase):
 		self.assertIn('well_child', toddler_wc_service.service)
 
 
+	def test_schedule_forecast(self):
+		call_command('setup_groups', stdout=StringIO())
+		client = APIClient()
+		client.force_authenticate(user=self.supervisor_user)
+		initial_count = HealthService.objects.filter(child=self.child).count()
+		until = self.child.dob + relativedelta(months=13)
+
+		response = client.get(f'/api/children/{self.child.id}/schedule-forecast/', {'until': until.isoformat()})
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(HealthService.objects.filter(child=self.child).count(), initial_count, 'Forecast wrote HealthService rows')
+
+		projected = [service for service in response.data if service['projected']]
+		self.assertEqual(len(response.data) - len(projected), initial_count)
+		wc_12m_due = (self.child.dob + relativedelta(months=12) + timedelta(days=10)).isoformat()
+		wc_12m = next(service for service in projected if service['due_date'] == wc_12m_due and 'well_child' in service['service'])
+		self.assertIn('MMR', wc_12m['immunizations'])
+		self.assertTrue(any('dental' in service['service'] for service in projected))
+		self.assertTrue(all(service['due_date'] <= until.isoformat() for service in response.data))
+
+		response = client.get(f'/api/children/{self.child.id}/schedule-forecast/', {'until': 'soon'})
+		self.assertEqual(response.status_code, 400)
+
+	def test_bulk_complete(self):
+		call_command('setup_groups', stdout=StringIO())
+		client = APIClient()
+		client.force_authenticate(user=self.caseworker_user)
+		wc_2m = HealthService.objects.get(child=self.child, due_date=self.child.dob + relativedelta(months=2) + timedelta(days=10))
+		wc_4m = HealthService.objects.get(child=self.child, due_date=self.child.dob + relativedelta(months=4) + timedelta(days=10))
+		payload = {'services': [
+			{'id': wc_4m.id, 'completed_date': (self.child.dob + relativedelta(months=4)).isoformat()},
+			{'id': wc_2m.id, 'completed_date': (self.child.dob + relativedelta(months=2)).isoformat()},
+		]}
+
+		# DTaP dose 1 has no administration date, so dose 2 cannot be recorded
+		response = client.post('/api/health-services/bulk-complete/', payload, format='json')
+		self.assertEqual(response.status_code, 400)
+		self.assertIn(str(wc_2m.id), response.data)
+		wc_2m.refresh_from_db()
+		self.assertEqual(wc_2m.status, 'pending', 'Failed batch was partially applied')
+
+		self.immunization2.delete()
+		response = client.post('/api/health-services/bulk-complete/', payload, format='json')
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual((response.data['completed'], response.data['skipped']), ([wc_4m.id, wc_2m.id], []))
+		wc_2m.refresh_from_db()
+		self.assertEqual(wc_2m.status, 'complete')
+		# Doses are sequenced by completion date, not request order
+		self.assertEqual(
+			list(ImmunizationRecord.objects.filter(child=self.child, vaccine_name='DTaP').order_by('dose_number').values_list('dose_number', 'date_administered')),
+			[(1, self.child.dob + relativedelta(months=2)), (2, self.child.dob + relativedelta(months=4))]
+		)
+		self.assertTrue(ImmunizationRecord.objects.filter(child=self.child, vaccine_name='HepB', dose_number=2).exists())
+
+		# Services that are already complete are reported as skipped
+		dental = HealthService.objects.create(child=self.child, service=['dental'], due_date=self.child.dob + relativedelta(months=12))
+		payload['services'].append({'id': dental.id, 'completed_date': dental.due_date.isoformat()})
+		response = client.post('/api/health-services/bulk-complete/', payload, format='json')
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual((response.data['completed'], response.data['skipped']), ([dental.id], [wc_4m.id, wc_2m.id]))
+
+	def test_immunization_status_tracks_records(self):
+		status = ImmunizationStatus.objects.get(child=self.child, vaccine_name='HepB')
+		self.assertEqual((status.highest_dose, status.last_administered), (1, self.child.dob))
+
+		dose2 = ImmunizationRecord.objects.create(child=self.child, vaccine_name='HepB', dose_number=2, date_administered=timezone.now().date())
+		status.refresh_from_db()
+		self.assertEqual(status.highest_dose, 2)
+
+		dose2.delete()
+		status.refresh_from_db()
+		self.assertEqual(status.highest_dose, 1)
+
+		self.immunization2.delete()
+		self.assertFalse(ImmunizationStatus.objects.filter(child=self.child, vaccine_name='DTaP').exists())
+
+	def test_bulk_complete_statement_count(self):
+		services = list(HealthService.objects.filter(child=self.child, status='pending'))
+		self.immunization2.delete()
+		# Seven statements, plus five for the response generation bump on the database cache
+		with self.assertNumQueries(12):
+			HealthService.objects.bulk_complete([(service, service.due_date) for service in services])
+
+	def test_bulk_complete_rejects_inaccessible_services(self):
+		call_command('setup_groups', stdout=StringIO())
+		other_child = Child.objects.create(first_name='Other', last_name='Child', dob=timezone.now().date())
+		other_service = HealthService.objects.create(child=other_child, service=['well_child'], due_date=timezone.now().date())
+		client = APIClient()
+		client.force_authenticate(user=self.caseworker_user)
+		response = client.post('/api/health-services/bulk-complete/', {'services': [{'id': other_service.id, 'completed_date': '2025-01-01'}]}, format='json')
+		self.assertEqual(response.status_code, 400)
+		other_service.refresh_from_db()
+		self.assertEqual(other_service.status, 'pending')
+
 	def tearDown(self):  
 		ImmunizationRecord.objects.all().delete()
 		HealthService.objects.all().delete()
@@ -119,4 +217,99 @@ class EPSDTTestCase(TestCase):
 		FosterFamily.objects.all().delete()
 		Child.objects.all().delete()
 		User.objects.all().delete()		
-		Group.objects.all().delete() 
\ No newline at end of file
+		Group.objects.all().delete()
+
+
+class ScheduleIndexTestCase(SimpleTestCase):
+	def test_index_matches_raw_schedule(self):
+		for age in WELL_CHILD_AGES:
+			expected = []
+			for vaccine, vaccine_data in EPSDT_REQUIREMENTS['immunization_schedule'].items():
+				for dose_info in vaccine_data.get('schedule', []):
+					if 'age_months' in dose_info and 'dose' in dose_info:
+						dose_ages = dose_info['age_months'] if isinstance(dose_info['age_months'], list) else [dose_info['age_months']]
+						if age in dose_ages:
+							expected.append((vaccine, int(dose_info['dose'][0])))
+			self.assertEqual(list(IMMUNIZATIONS_BY_AGE.get(age, ())), expected, f'Index mismatch at {age} months')
+
+	def test_index_is_immutable(self):
+		with self.assertRaises(TypeError):
+			IMMUNIZATIONS_BY_AGE[3] = (('HepB', 1),)
+
+
+class BatchGenerationTestCase(TestCase):
+	def setUp(self):
+		self.today = timezone.now().date()
+		self.children = [
+			Child.objects.create(first_name=f'Batch{i}', last_name='Child', dob=self.today - relativedelta(months=i * 7))
+			for i in range(12)
+		]
+
+	def test_batch_matches_single_child_rules(self):
+		wc, dental = generate_health_services_for_children(self.children, self.today)
+		self.assertGreater(wc, 0)
+		self.assertGreater(dental, 0)
+
+		infant = self.children[0]
+		wc_due = infant.dob + relativedelta(months=2) + timedelta(days=10)
+		self.assertTrue(HealthService.objects.filter(child=infant, service__contains='well_child', due_date=wc_due).exists())
+		self.assertFalse(HealthService.objects.filter(child=infant, service__contains='dental').exists())
+
+		# Re-running is idempotent
+		self.assertEqual(generate_health_services_for_children(self.children, self.today), (0, 0))
+
+	def test_query_count_is_constant(self):
+		ImmunizationRecord.objects.create(child=self.children[0], vaccine_name='HepB', dose_number=1, date_administered=self.children[0].dob)
+
+		# Five statements, plus five for the response generation bump on the database cache
+		with self.assertNumQueries(10):
+			generate_health_services_for_children(self.children[:2], self.today)
+		with self.assertNumQueries(10):
+			generate_health_services_for_children(self.children[2:], self.today)
+
+	def test_concurrent_marks_survive_generation(self):
+		# A child marked dirty while its shard is being planned keeps the flag
+		marked, untouched = self.children[:2]
+		original = calculate_ages_in_months
+
+		def mark_mid_run(*args, **kwargs):
+			mark_schedule_dirty([marked.id])
+			return original(*args, **kwargs)
+
+		with patch('c2c.models.calculate_ages_in_months', mark_mid_run):
+			generate_health_services_for_children([marked, untouched], self.today)
+		self.assertEqual(
+			dict(Child.objects.filter(id__in=[marked.id, untouched.id]).values_list('id', 'schedule_dirty')),
+			{marked.id: True, untouched.id: False}
+		)
+
+		# Saving an instance loaded before a mark does not clear it either
+		stale = Child.objects.get(pk=untouched.pk)
+		mark_schedule_dirty([untouched.id])
+		stale.allergies = 'Peanuts'
+		stale.save()
+		untouched.refresh_from_db()
+		self.assertTrue(untouched.schedule_dirty)
+		self.assertEqual(untouched.allergies, 'Peanuts')
+
+
+class AgeCalculationTestCase(SimpleTestCase):
+	def test_vectorized_ages_match_relativedelta(self):
+		dobs = [
+			date(2020, 1, 31), date(2020, 2, 29), date(2019, 3, 31), date(2021, 8, 30),
+			date(2023, 12, 31), date(2024, 1, 1), date(2024, 6, 15), date(2025, 10, 1)
+		]
+		references = [date(2023, 1, 1) + timedelta(days=offset) for offset in range(0, 1100, 7)]
+		references += [date(2024, 2, 28), date(2024, 2, 29), date(2025, 2, 28), date(2024, 4, 30), date(2025, 3, 1)]
+
+		for dob in dobs:
+			expected = [calculate_age_in_months(dob, reference) for reference in references]
+			self.assertEqual(calculate_ages_in_months(dob, references).tolist(), expected, f'Mismatch for dob {dob}')
+
+	def test_vectorized_ages_for_cohort(self):
+		dobs = [date(2020, 1, 31), date(2022, 5, 5), date(2025, 9, 30)]
+		reference = date(2025, 10, 30)
+		self.assertEqual(
+			calculate_ages_in_months(dobs, reference).tolist(),
+			[calculate_age_in_months(dob, reference) for dob in dobs]
+		)
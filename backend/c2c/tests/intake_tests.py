@@ -0,0 +1,82 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from django.test import TestCase
+from django.core.management import call_command
+from django.contrib.auth.models import User, Group
+from datetime import date
+from c2c.intake import import_children, read_rows
+from c2c.models import Case, Child, ChildAccess, FosterFamily, FosterPlacement, HealthService
+
+class IntakeTestCase(TestCase):
+	def setUp(self):
+		self.caseworker_user = User.objects.create_user(username='caseworker1', password='testpass123')
+		self.caseworker_user.groups.add(Group.objects.get_or_create(name='Caseworker')[0])
+		self.fosterparent_user = User.objects.create_user(username='fosterparent1', password='testpass123')
+		self.family = FosterFamily.objects.create(family_name='Intake', parent1=self.fosterparent_user)
+		self.existing = Child.objects.create(first_name='Old', last_name='Timer', dob=date(2015, 5, 5))
+
+	def _csv(self, *rows):
+		header = 'first_name,last_name,dob,allergies,foster_family,placement_start_date,caseworker,case_start_date'
+		return StringIO('\n'.join([header, *rows]) + '\n')
+
+	def test_csv_intake(self):
+		lines = self._csv(
+			f'Ana,Lopez,2019-04-02,Peanuts,{self.family.id},2025-01-06,{self.caseworker_user.id},2025-01-06',
+			f'Ben,Lopez,2021-09-14,,{self.family.id},2025-01-06,{self.caseworker_user.id},2025-02-03',
+			f'Cal,Lopez,2023-01-30,,,,{self.caseworker_user.id},2025-02-03',
+			'Dee,Lopez,2024-06-01,,,,,',
+			'Old,Timer,2015-05-05,,,,,',
+			'Ana,Lopez,2019-04-02,,,,,',
+			'Eve,Lopez,not-a-date,,,,,',
+			f'Fay,Lopez,2020-03-03,,999999,2025-01-06,{self.fosterparent_user.id},2025-01-06',
+			f'Gus,Lopez,2020-03-03,,{self.family.id},,,',
+		)
+		progress = []
+		report = import_children(read_rows(lines, 'csv'), chunk_size=3, progress=lambda r: progress.append(r['rows']))
+
+		self.assertEqual(progress, [3, 6, 9])
+		self.assertEqual(report['created'], 4)
+		# The file's own repeat of Ana is caught across chunks, like the existing child
+		self.assertEqual(report['duplicates'], [6, 7])
+		self.assertEqual([error['line'] for error in report['errors']], [8, 9, 10])
+		self.assertEqual(set(report['errors'][1]['errors']), {'foster_family', 'caseworker'})
+		self.assertIn('placement_start_date', report['errors'][2]['errors'])
+
+		ana = Child.objects.get(first_name='Ana')
+		self.assertEqual(ana.allergies, 'Peanuts')
+		case = Case.objects.get(child=ana)
+		self.assertEqual(case.placement, FosterPlacement.objects.get(child=ana, end_date__isnull=True))
+		self.assertEqual(case.status, 'open')
+		self.assertFalse(Case.objects.filter(child__first_name='Dee').exists())
+
+		# Access follows the new cases and placements
+		self.assertEqual(
+			set(ChildAccess.objects.filter(user=self.caseworker_user).values_list('child__first_name', flat=True)),
+			{'Ana', 'Ben', 'Cal'}
+		)
+		self.assertTrue(ChildAccess.objects.filter(user=self.fosterparent_user, child=ana).exists())
+
+		# Services are generated for children with cases, from the case start date
+		for first_name in ('Ana', 'Ben', 'Cal'):
+			child = Child.objects.get(first_name=first_name)
+			self.assertFalse(child.schedule_dirty)
+			self.assertTrue(HealthService.objects.filter(child=child).exists())
+		self.assertTrue(Child.objects.get(first_name='Dee').schedule_dirty)
+
+	def test_ndjson_command(self):
+		rows = [
+			{'first_name': 'Ana', 'last_name': 'Lopez', 'dob': '2019-04-02', 'caseworker': self.caseworker_user.id, 'case_start_date': '2025-01-06'},
+			{'first_name': 'Ben', 'last_name': 'Lopez', 'dob': '2021-09-14', 'allergies': None},
+		]
+		with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False) as f:
+			f.write('\n'.join(json.dumps(row) for row in rows) + '\n\n{not json\n')
+		self.addCleanup(os.remove, f.name)
+
+		out, err = StringIO(), StringIO()
+		call_command('import_children', f.name, stdout=out, stderr=err)
+		self.assertIn('Imported 2 of 3 rows, 1 rejected', out.getvalue())
+		self.assertIn('Line 4:', err.getvalue())
+		self.assertEqual(Case.objects.get(child__first_name='Ana').caseworker, self.caseworker_user)
+		self.assertIsNone(Child.objects.get(first_name='Ben').allergies)
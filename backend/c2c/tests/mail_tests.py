@@ -0,0 +1,77 @@
+from django.test import SimpleTestCase, override_settings
+from django.core.mail import EmailMessage
+from c2c.mail import MessageSender, _RateLimiter, send_messages_batched, send_messages_concurrently
+from .smtp_server import LocalSMTPServer
+import time
+
+
+class AsyncDispatchTestCase(SimpleTestCase):
+	def _smtp(self, **kwargs):
+		server = LocalSMTPServer(**kwargs).start()
+		self.addCleanup(server.stop)
+		settings_override = override_settings(
+			EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend', EMAIL_HOST='127.0.0.1', EMAIL_PORT=server.port
+		)
+		settings_override.enable()
+		self.addCleanup(settings_override.disable)
+		return server
+
+	def _messages(self, recipients):
+		return [EmailMessage('Reminder', 'Body', 'c2c@mail.com', [recipient]) for recipient in recipients]
+
+	def test_concurrent_sessions(self):
+		server = self._smtp(delay=0.2)
+		messages = self._messages([f'user{i}@mail.com' for i in range(8)])
+
+		start = time.monotonic()
+		results = send_messages_concurrently(messages, concurrency=4)
+		elapsed = time.monotonic() - start
+
+		self.assertEqual(results, [True] * 8)
+		self.assertEqual(len(server.messages), 8)
+		self.assertEqual(server.connections, 4)
+		self.assertGreater(server.max_active_sessions, 1)
+		# 8 x 0.2s of SMTP latency spread over 4 sessions
+		self.assertLess(elapsed, 1.2)
+
+	def test_transient_failures_are_retried(self):
+		server = self._smtp(transient={'flaky@mail.com': 2}, reject={'gone@mail.com'})
+		messages = self._messages(['flaky@mail.com', 'gone@mail.com', 'fine@mail.com'])
+
+		results = send_messages_concurrently(messages, concurrency=2, max_retries=3, retry_backoff=0.01)
+
+		self.assertEqual(results, [True, False, True])
+		self.assertEqual(sorted(recipients[0] for recipients, _ in server.messages), ['fine@mail.com', 'flaky@mail.com'])
+
+	def test_retries_are_bounded(self):
+		self._smtp(transient={'flaky@mail.com': 5})
+		results = send_messages_concurrently(self._messages(['flaky@mail.com']), concurrency=1, max_retries=2, retry_backoff=0.01)
+		self.assertEqual(results, [False])
+
+	def test_rate_limit(self):
+		self._smtp()
+		start = time.monotonic()
+		send_messages_concurrently(self._messages([f'user{i}@mail.com' for i in range(5)]), concurrency=5, rate_limit=20)
+		# Five sends at 20/s need at least four 50ms gaps
+		self.assertGreaterEqual(time.monotonic() - start, 0.2)
+
+	def test_sender_keeps_sessions_and_pace_across_batches(self):
+		server = self._smtp()
+		start = time.monotonic()
+		with MessageSender(concurrency=2, rate_limit=20) as sender:
+			for batch in range(3):
+				self.assertEqual(sender.send(self._messages([f'user{batch}{i}@mail.com' for i in range(2)])), [True, True])
+		# Six sends at 20/s over the sender's lifetime, on the same two sessions
+		self.assertGreaterEqual(time.monotonic() - start, 0.25)
+		self.assertEqual(server.connections, 2)
+		self.assertEqual(len(server.messages), 6)
+
+	def test_batched_sends_are_paced(self):
+		server = self._smtp()
+		limiter = _RateLimiter(20)
+		start = time.monotonic()
+		for batch in range(2):
+			send_messages_batched(self._messages([f'user{batch}{i}@mail.com' for i in range(3)]), batch_size=2, limiter=limiter)
+		# Six sends at 20/s, paced across calls sharing the limiter
+		self.assertGreaterEqual(time.monotonic() - start, 0.25)
+		self.assertEqual(len(server.messages), 6)
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+
+
+class LocalSMTPServer:
+	# Minimal asyncio SMTP stand-in for delivery tests. Recipients in `reject`
+	# are refused permanently; those in `transient` get a 451 for their first N
+	# attempts. `delay` adds latency (seconds) to every accepted message.
+	def __init__(self, reject=(), transient=None, delay=0):
+		self.reject = set(reject)
+		self.transient = dict(transient or {})
+		self.delay = delay
+		self.messages = []
+		self.connections = 0
+		self.active_sessions = 0
+		self.max_active_sessions = 0
+		self._loop = asyncio.new_event_loop()
+		self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+
+	def start(self):
+		self._thread.start()
+		self._server = asyncio.run_coroutine_threadsafe(
+			asyncio.start_server(self._handle, '127.0.0.1', 0), self._loop
+		).result()
+		self.port = self._server.sockets[0].getsockname()[1]
+		return self
+
+	def stop(self):
+		self._loop.call_soon_threadsafe(self._server.close)
+		self._loop.call_soon_threadsafe(self._loop.stop)
+		self._thread.join(timeout=5)
+
+	async def _handle(self, reader, writer):
+		self.connections += 1
+		self.active_sessions += 1
+		self.max_active_sessions = max(self.max_active_sessions, self.active_sessions)
+		recipients = []
+
+		def reply(line):
+			writer.write(f'{line}\r\n'.encode())
+
+		reply('220 localhost ESMTP stand-in')
+		try:
+			while True:
+				line = await reader.readline()
+				if not line:
+					break
+				command = line.decode().strip()
+				verb = command[:4].upper()
+				if verb in ('EHLO', 'HELO'):
+					reply('250 localhost')
+				elif verb == 'MAIL':
+					recipients = []
+					reply('250 OK')
+				elif verb == 'RCPT':
+					address = command.split(':', 1)[1].strip().strip('<>')
+					if address in self.reject:
+						reply('550 Mailbox unavailable')
+					elif self.transient.get(address, 0) > 0:
+						self.transient[address] -= 1
+						reply('451 Try again later')
+					else:
+						recipients.append(address)
+						reply('250 OK')
+				elif verb == 'DATA':
+					reply('354 End data with <CR><LF>.<CR><LF>')
+					await writer.drain()
+					data = []
+					while (chunk := await reader.readline()) not in (b'.\r\n', b''):
+						data.append(chunk)
+					if self.delay:
+						await asyncio.sleep(self.delay)
+					self.messages.append((recipients, b''.join(data)))
+					reply('250 Queued')
+				elif verb in ('RSET', 'NOOP'):
+					reply('250 OK')
+				elif verb == 'QUIT':
+					reply('221 Bye')
+					await writer.drain()
+					break
+				else:
+					reply('502 Not implemented')
+				await writer.drain()
+		finally:
+			self.active_sessions -= 1
+			writer.close()
@@ -1,17 +1,26 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.db import connection
+from contextlib import contextmanager
 from django.utils import timezone
-from django.core.mail import send_mail
+from django.core import mail
 from django.conf import settings
 from django.contrib.auth.models import User, Group
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 from unittest.mock import patch, MagicMock
-from c2c.tasks import generate_upcoming_health_services, send_health_reminders
-from c2c.models import Case, Child, FosterFamily, FosterPlacement, HealthService, ImmunizationRecord, ReminderLog, calculate_age_in_months
+from c2c.tasks import OUTBOX_DRAINER_LOCK, generate_upcoming_health_services, send_health_reminders, drain_notification_outbox, _child_id_ranges, _children_due_for_scheduling, _reminder_candidates
+from django_q.models import Task
+from .smtp_server import LocalSMTPServer
+from c2c.models import Case, Child, FosterFamily, FosterPlacement, HealthService, ImmunizationRecord, NotificationOutbox, ReminderLog, calculate_age_in_months
 from c2c.constants import EPSDT_REQUIREMENTS
 
 class TasksTestCase(TestCase):
 	def setUp(self):
+		# Run django-q tasks inline so shard results are available immediately
+		sync_patcher = patch('django_q.conf.Conf.SYNC', True)
+		sync_patcher.start()
+		self.addCleanup(sync_patcher.stop)
+
 		# User groups
 		self.caseworker_group, _ = Group.objects.get_or_create(name='Caseworker')
 		self.fosterparent_group, _ = Group.objects.get_or_create(name='FosterParent')
@@ -80,9 +89,55 @@ class TasksTestCase(TestCase):
 		result = generate_upcoming_health_services()
 		self.assertGreater(HealthService.objects.filter(child=self.child).count(), initial_count, 'HealthService record not created for 4m visit')
 	
+	@override_settings(HEALTHSERVICE_SHARDS=3)
+	@patch('c2c.tasks.timezone.now')
+	def test_generate_upcoming_health_services_sharded(self, mock_now):
+		mock_now.return_value = timezone.make_aware(datetime(2025, 10, 1))
+		for i in range(4):
+			child = Child.objects.create(first_name=f'Shard{i}', last_name='Child', dob=datetime(2024, 1 + i, 15).date())
+			Case.objects.create(child=child, caseworker=self.caseworker_user, status='open', start_date=datetime(2025, 9, 15).date())
+
+		with self.assertLogs('c2c.tasks', 'INFO') as logs:
+			result = generate_upcoming_health_services()
+		self.assertTrue(result.startswith('Queued 3 health service shards for 5 children'))
+
+		shard_tasks = Task.objects.filter(func='c2c.tasks.generate_health_services_for_shard')
+		self.assertEqual(shard_tasks.count(), 3)
+		created_wc = sum(task.result[0] for task in shard_tasks)
+		created_dental = sum(task.result[1] for task in shard_tasks)
+		self.assertGreater(created_wc, 0)
+		# Only the last shard's hook reports, with the group's combined counts
+		summaries = [line for line in logs.output if 'HealthService records' in line]
+		self.assertEqual(len(summaries), 1)
+		self.assertIn(f'Created {created_wc} new well_child and {created_dental} new dental HealthService records.', summaries[0])
+
+	def test_child_id_ranges(self):
+		self.assertEqual(_child_id_ranges([1, 2, 5, 8, 9], 2), [(1, 5), (8, 9)])
+		self.assertEqual(_child_id_ranges([3, 4], 4), [(3, 3), (4, 4)])
+
+	def test_incremental_scheduling_watermark(self):
+		self.child.refresh_from_db()
+		self.assertFalse(self.child.schedule_dirty)
+		# Next well-child (4 months) enters the window on 2025-09-27
+		self.assertEqual(self.child.schedule_horizon, datetime(2025, 9, 27).date() + timedelta(days=90))
+		self.assertNotIn(self.child, _children_due_for_scheduling(datetime(2025, 9, 25).date()))
+		self.assertIn(self.child, _children_due_for_scheduling(datetime(2025, 9, 27).date()))
+
+	def test_scheduling_events_mark_child_dirty(self):
+		reference_date = datetime(2025, 9, 25).date()
+
+		ImmunizationRecord.objects.create(child=self.child, vaccine_name='HepB', dose_number=1, date_administered=self.child.dob)
+		self.assertIn(self.child, _children_due_for_scheduling(reference_date))
+		generate_upcoming_health_services()
+		self.assertNotIn(self.child, _children_due_for_scheduling(reference_date))
+
+		self.child.refresh_from_db()
+		self.child.dob = datetime(2025, 8, 20).date()
+		self.child.save()
+		self.assertIn(self.child, _children_due_for_scheduling(reference_date))
+
 	# Test email reminder sending
-	@patch('c2c.tasks.send_mail')
-	def test_send_health_reminders(self, mock_send_mail):
+	def test_send_health_reminders(self):
 		# Use current date (Sept 30, 2025)
 		today = timezone.now().date()
 		due_date = today + timedelta(days=30)  # Due Oct 30, 2025, triggers 30-day reminder today
@@ -96,13 +151,202 @@ class TasksTestCase(TestCase):
 		result = send_health_reminders()
 
 		# Assert email sent
-		self.assertEqual(mock_send_mail.call_count, 3)
+		self.assertEqual(len(mail.outbox), 3)
 		logs = ReminderLog.objects.filter(service=service)
 		self.assertTrue(logs.exists(), 'No sent logs created')
 		self.assertEqual(ReminderLog.objects.filter(service=service).count(), 3, "Unexpected number of logs generated")
-		
+
+	def test_send_health_reminders_over_smtp(self):
+		server = LocalSMTPServer(reject={'fp2@mail.com'}).start()
+		self.addCleanup(server.stop)
+		today = timezone.now().date()
+		services = [
+			HealthService.objects.create(child=self.child, service=['well_child'], due_date=today + timedelta(days=interval), status='pending')
+			for interval in (30, 14)
+		]
+
+		with override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend', EMAIL_HOST='127.0.0.1', EMAIL_PORT=server.port, REMINDER_EMAIL_BATCH_SIZE=10):
+			result = send_health_reminders()
+
+		# One digest per recipient covering both services
+		self.assertEqual(result, 'Queued 3 reminders')
+		drain_results = [task.result for task in Task.objects.filter(func='c2c.tasks.drain_notification_outbox')]
+		self.assertIn('Sent 2 reminders, 1 failures', drain_results)
+		self.assertEqual(len(server.messages), 2)
+		# Refused recipients do not cost the batch its session
+		self.assertEqual(server.connections, 1)
+		self.assertEqual(ReminderLog.objects.filter(service__in=services, status='failed').count(), 2)
+		self.assertFalse(ReminderLog.objects.filter(user=self.fosterparent2_user, status='sent').exists())
+
+	def test_send_health_reminders_digest(self):
+		today = timezone.now().date()
+		other_child = Child.objects.create(first_name='Other', last_name='Kid', dob=datetime(2023, 5, 5).date())
+		Case.objects.create(child=other_child, caseworker=self.caseworker_user, status='open', start_date=today)
+		services = [
+			HealthService.objects.create(child=self.child, service=['well_child'], due_date=today + timedelta(days=30), status='pending'),
+			HealthService.objects.create(child=self.child, service=['dental'], due_date=today + timedelta(days=7), status='pending'),
+			HealthService.objects.create(child=other_child, service=['well_child'], due_date=today + timedelta(days=14), status='pending'),
+		]
+
+		send_health_reminders()
+
+		# Caseworker plus both foster parents, one email each
+		self.assertEqual(len(mail.outbox), 3)
+		caseworker_email = next(email for email in mail.outbox if email.to == ['caseworker1@mail.com'])
+		self.assertIn('Test Child', caseworker_email.body)
+		self.assertIn('Other Kid', caseworker_email.body)
+		self.assertEqual(ReminderLog.objects.filter(user=self.caseworker_user).count(), 3)
+		self.assertEqual(ReminderLog.objects.filter(user=self.fosterparent1_user).count(), 2)
+		self.assertEqual(ReminderLog.objects.filter(service=services[2]).count(), 1)
+
+	def test_notification_outbox_survives_retries(self):
+		today = timezone.now().date()
+		HealthService.objects.create(child=self.child, service=['well_child'], due_date=today + timedelta(days=14), status='pending')
+
+		with patch('c2c.tasks.async_task'):
+			self.assertEqual(send_health_reminders(), 'Queued 3 reminders')
+			# A retried daily run does not queue the same digests again
+			self.assertEqual(send_health_reminders(), 'Queued 0 reminders')
+		self.assertEqual(len(mail.outbox), 0)
+		self.assertEqual(NotificationOutbox.objects.filter(status='pending').count(), 3)
+
+		self.assertEqual(drain_notification_outbox(), 'Sent 3 reminders, 0 failures')
+		self.assertEqual(drain_notification_outbox(), 'Sent 0 reminders, 0 failures')
+		self.assertEqual(len(mail.outbox), 3)
+		self.assertEqual(NotificationOutbox.objects.filter(status='sent').count(), 3)
+		self.assertEqual(ReminderLog.objects.filter(status='sent').count(), 3)
+
+	def _queue_digests(self):
+		HealthService.objects.create(child=self.child, service=['well_child'], due_date=timezone.now().date() + timedelta(days=14), status='pending')
+		with patch('c2c.tasks.async_task'):
+			send_health_reminders()
+
+	def test_outbox_rows_are_claimed_before_sending(self):
+		self._queue_digests()
+		statuses = []
+
+		@contextmanager
+		def sender(rate_limit):
+			def send(messages):
+				statuses.append(sorted(NotificationOutbox.objects.values_list('status', flat=True)))
+				return [True] * len(messages)
+			yield send
+
+		with patch('c2c.tasks.reminder_sender', sender):
+			self.assertEqual(drain_notification_outbox(), 'Sent 3 reminders, 0 failures')
+		# Sends happen after the claim is committed, never under the row locks
+		self.assertEqual(statuses, [['sending'] * 3])
+		self.assertEqual(list(NotificationOutbox.objects.values_list('attempts', flat=True)), [1, 1, 1])
+
+	def test_outbox_stale_claims_are_released(self):
+		self._queue_digests()
+		stale, fresh, pending = NotificationOutbox.objects.order_by('id')
+		NotificationOutbox.objects.filter(pk=stale.pk).update(status='sending', claimed_date=timezone.now() - timedelta(hours=1))
+		NotificationOutbox.objects.filter(pk=fresh.pk).update(status='sending', claimed_date=timezone.now())
+
+		self.assertEqual(drain_notification_outbox(), 'Sent 2 reminders, 0 failures')
+		self.assertEqual(
+			dict(NotificationOutbox.objects.values_list('id', 'status')),
+			{stale.id: 'sent', fresh.id: 'sending', pending.id: 'sent'}
+		)
+
+	@override_settings(NOTIFICATION_OUTBOX_MAX_ATTEMPTS=2)
+	def test_failed_outbox_rows_are_retried(self):
+		self._queue_digests()
+		results = []
+
+		@contextmanager
+		def sender(rate_limit):
+			yield lambda messages: [results.pop(0) for _ in messages]
+
+		def age_claims():
+			NotificationOutbox.objects.update(claimed_date=timezone.now() - timedelta(seconds=settings.NOTIFICATION_OUTBOX_RETRY_DELAY + 1))
+
+		with patch('c2c.tasks.reminder_sender', sender):
+			results.extend([True, False, False])
+			self.assertEqual(drain_notification_outbox(), 'Sent 1 reminders, 2 failures')
+			self.assertEqual(sorted(NotificationOutbox.objects.values_list('status', flat=True)), ['pending', 'pending', 'sent'])
+			# Not retried before NOTIFICATION_OUTBOX_RETRY_DELAY
+			self.assertEqual(drain_notification_outbox(), 'Sent 0 reminders, 0 failures')
+
+			age_claims()
+			results.extend([True, False])
+			self.assertEqual(drain_notification_outbox(), 'Sent 1 reminders, 1 failures')
+			age_claims()
+			self.assertEqual(drain_notification_outbox(), 'Sent 0 reminders, 0 failures')
+
+		# Out of attempts, the last row stays failed; every attempt is logged
+		self.assertEqual(sorted(NotificationOutbox.objects.values_list('status', 'attempts')), [('failed', 2), ('sent', 1), ('sent', 2)])
+		self.assertEqual(ReminderLog.objects.filter(status='failed').count(), 3)
+
+		# A stale claim with no attempts left is not released again
+		NotificationOutbox.objects.filter(status='failed').update(status='sending', claimed_date=timezone.now() - timedelta(hours=1))
+		self.assertEqual(drain_notification_outbox(), 'Sent 0 reminders, 0 failures')
+		self.assertEqual(NotificationOutbox.objects.filter(status='failed').count(), 1)
+
+	def test_outbox_drainer_budget_and_slots(self):
+		self._queue_digests()
+		with override_settings(NOTIFICATION_OUTBOX_DRAIN_BUDGET=0), patch('c2c.tasks.async_task') as async_task:
+			self.assertEqual(drain_notification_outbox(), 'Sent 0 reminders, 0 failures')
+		# Out of time, the drainer hands the backlog to a successor
+		async_task.assert_called_once_with('c2c.tasks.drain_notification_outbox')
+
+		# Drainers beyond NOTIFICATION_OUTBOX_DRAINERS exit without claiming
+		other = connection.copy()
+		self.addCleanup(other.close)
+		with other.cursor() as cursor:
+			for slot in range(settings.NOTIFICATION_OUTBOX_DRAINERS):
+				cursor.execute('SELECT pg_advisory_lock(%s, %s)', [OUTBOX_DRAINER_LOCK, slot])
+		self.assertIn('all drainer slots busy', drain_notification_outbox())
+		self.assertEqual(NotificationOutbox.objects.filter(status='pending').count(), 3)
+
+	def test_outbox_drainers_share_the_rate_limit(self):
+		self._queue_digests()
+		rates = []
+
+		@contextmanager
+		def sender(rate_limit):
+			rates.append(rate_limit)
+			yield lambda messages: [True] * len(messages)
+
+		with patch('c2c.tasks.reminder_sender', sender), override_settings(REMINDER_EMAIL_RATE_LIMIT=10, NOTIFICATION_OUTBOX_DRAINERS=4):
+			drain_notification_outbox()
+		self.assertEqual(rates, [2.5])
+
+	def test_send_health_reminders_async_dispatch(self):
+		server = LocalSMTPServer(transient={'fp1@mail.com': 1}).start()
+		self.addCleanup(server.stop)
+		service = HealthService.objects.create(child=self.child, service=['dental'], due_date=timezone.now().date() + timedelta(days=7), status='pending')
+
+		with override_settings(
+			EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend', EMAIL_HOST='127.0.0.1', EMAIL_PORT=server.port,
+			REMINDER_EMAIL_DISPATCH='async', REMINDER_EMAIL_RETRY_BACKOFF=0.01, REMINDER_EMAIL_RATE_LIMIT=0
+		):
+			result = send_health_reminders()
+
+		self.assertEqual(result, 'Queued 3 reminders')
+		self.assertEqual(ReminderLog.objects.filter(service=service, status='sent').count(), 3)
+
+	def test_reminder_candidates_query_count(self):
+		today = timezone.now().date()
+		other_child = Child.objects.create(first_name='Other', last_name='Child', dob=datetime(2024, 2, 2).date())
+		Case.objects.create(child=other_child, caseworker=self.caseworker_user, status='open', start_date=today)
+		for child in (self.child, other_child):
+			for interval in (30, 14, 7, 5):
+				HealthService.objects.create(child=child, service=['well_child'], due_date=today + timedelta(days=interval), status='pending')
+
+		with self.assertNumQueries(2):
+			candidates = list(_reminder_candidates(today))
+			recipients = [
+				(case.caseworker, case.placement and case.placement.foster_family.parent2)
+				for service in candidates for case in service.child.open_cases
+			]
+		self.assertEqual(len(candidates), 6)
+		self.assertIn((self.caseworker_user, self.fosterparent2_user), recipients)
+
 	def tearDown(self):
 		ReminderLog.objects.all().delete()
+		NotificationOutbox.objects.all().delete()
 		ImmunizationRecord.objects.all().delete()
 		HealthService.objects.all().delete()
 		Case.objects.all().delete()
@@ -1,11 +1,25 @@
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
-from .models import User, Case, Child, FosterFamily, FosterPlacement, HealthService, ReminderLog, ImmunizationRecord 
-from .serializers import UserSerializer, CaseSerializer, ChildSerializer, FosterFamilySerializer, FosterPlacementSerializer, HealthServiceSerializer, ReminderSerializer, ImmunizationRecordSerializer
-from .permissions import RoleBasedPermission
-from .mixins import RoleBasedQuerySetMixin
+from rest_framework.response import Response
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Count, Min, Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+from datetime import date, timedelta
+from functools import reduce
+import codecs
+import operator
+from dateutil.relativedelta import relativedelta
+from .models import User, Case, Child, FosterFamily, FosterPlacement, HealthService, ReminderLog, ImmunizationRecord, ImmunizationStatus, project_health_services
+from .serializers import UserSerializer, CaseSerializer, ChildSerializer, FosterFamilySerializer, FosterPlacementSerializer, HealthServiceSerializer, ReminderSerializer, ImmunizationRecordSerializer, ScheduleForecastSerializer, BulkCompleteSerializer
+from .permissions import RoleBasedPermission, BulkChangePermission, IntakePermission
+from .intake import import_children, intake_format, read_rows
+from .mixins import ConditionalGetMixin, ResponseCacheMixin, RoleBasedQuerySetMixin, SparseFieldsetQuerySetMixin, StreamingListMixin
 	
-class UserViewSet(RoleBasedQuerySetMixin, viewsets.ModelViewSet):
+class UserViewSet(SparseFieldsetQuerySetMixin, RoleBasedQuerySetMixin, viewsets.ModelViewSet):
 	queryset = User.objects.all()
 	serializer_class = UserSerializer
 	model = User
@@ -18,43 +32,156 @@ class UserViewSet(RoleBasedQuerySetMixin, viewsets.ModelViewSet):
 			queryset = queryset.filter(groups__name=group_name).distinct()	
 		return queryset
 
-class CaseViewSet(RoleBasedQuerySetMixin, viewsets.ModelViewSet):
+class CaseViewSet(StreamingListMixin, ResponseCacheMixin, ConditionalGetMixin, SparseFieldsetQuerySetMixin, RoleBasedQuerySetMixin, viewsets.ModelViewSet):
 	queryset = Case.objects.select_related('child', 'caseworker', 'placement')
 	serializer_class = CaseSerializer
 	model = Case
 	permission_classes = [IsAuthenticated, RoleBasedPermission]
+	cache_models = (Case, Child)
 
-class ChildViewSet(RoleBasedQuerySetMixin, viewsets.ModelViewSet):
+class ChildViewSet(StreamingListMixin, ResponseCacheMixin, ConditionalGetMixin, SparseFieldsetQuerySetMixin, RoleBasedQuerySetMixin, viewsets.ModelViewSet):
 	queryset = Child.objects.all()
 	serializer_class = ChildSerializer
 	model = Child
 	permission_classes = [IsAuthenticated, RoleBasedPermission]
+	cache_models = (Child,)
+
+	def get_queryset(self):
+		# ?first_name= / ?last_name= match a case-insensitive prefix (served by the
+		# text_pattern_ops indexes on Child); ?dob=, ?dob_after= and ?dob_before= are inclusive
+		queryset = super().get_queryset()
+		params = self.request.query_params
+		for field in ('first_name', 'last_name'):
+			value = params.get(field, '').strip()
+			if value:
+				queryset = queryset.alias(**{f'{field}_lower': Lower(field)}).filter(**{f'{field}_lower__startswith': value.lower()})
+
+		for param, lookup in (('dob', 'dob'), ('dob_after', 'dob__gte'), ('dob_before', 'dob__lte')):
+			value = params.get(param)
+			if value:
+				try:
+					queryset = queryset.filter(**{lookup: date.fromisoformat(value)})
+				except ValueError:
+					raise ValidationError({param: 'Use YYYY-MM-DD.'})
+		return queryset
+
+	@action(detail=True, methods=['get'], url_path='schedule-forecast')
+	def schedule_forecast(self, request, pk=None):
+		child = self.get_object()
+		today = timezone.now().date()
+		until = request.query_params.get('until')
+		try:
+			until = date.fromisoformat(until) if until else today + relativedelta(years=1)
+		except ValueError:
+			raise ValidationError({'until': 'Use YYYY-MM-DD.'})
+		# EPSDT coverage ends at 21
+		until = min(until, child.dob + relativedelta(years=21))
+
+		recorded_doses = ImmunizationStatus.objects.recorded_doses([child.id])[child.id]
+		existing = list(HealthService.objects.filter(child=child).order_by('due_date'))
+		projected = project_health_services(child, recorded_doses, existing, today, until)
+
+		timeline = sorted(existing + projected, key=lambda service: service.due_date)
+		return Response(ScheduleForecastSerializer(timeline, many=True).data)
+
+	@action(detail=False, methods=['post'], parser_classes=[MultiPartParser], permission_classes=[IsAuthenticated, IntakePermission])
+	def intake(self, request):
+		# Multipart upload of a .csv or .ndjson intake file in `file`; see c2c.intake.
+		# Very large files are better loaded with the import_children command.
+		upload = request.FILES.get('file')
+		if upload is None:
+			raise ValidationError({'file': 'Upload a CSV or NDJSON intake file.'})
+		format = intake_format(upload.name)
+		if format is None:
+			raise ValidationError({'file': 'Use a .csv, .ndjson or .jsonl file.'})
+		return Response(import_children(read_rows(codecs.iterdecode(upload, 'utf-8-sig'), format)))
 	
-class FosterFamilyViewSet(RoleBasedQuerySetMixin, viewsets.ModelViewSet):
+class FosterFamilyViewSet(SparseFieldsetQuerySetMixin, RoleBasedQuerySetMixin, viewsets.ModelViewSet):
 	queryset = FosterFamily.objects.all()
 	serializer_class = FosterFamilySerializer
 	model = FosterFamily
 	permission_classes = [IsAuthenticated, RoleBasedPermission]
 
-class FosterPlacementViewSet(RoleBasedQuerySetMixin, viewsets.ModelViewSet):
+class FosterPlacementViewSet(StreamingListMixin, ConditionalGetMixin, SparseFieldsetQuerySetMixin, RoleBasedQuerySetMixin, viewsets.ModelViewSet):
 	queryset = FosterPlacement.objects.all()
 	serializer_class = FosterPlacementSerializer
 	model = FosterPlacement
 	permission_classes = [IsAuthenticated, RoleBasedPermission]
 
-class HealthServiceViewSet(RoleBasedQuerySetMixin, viewsets.ModelViewSet):
+class HealthServiceViewSet(StreamingListMixin, ResponseCacheMixin, ConditionalGetMixin, SparseFieldsetQuerySetMixin, RoleBasedQuerySetMixin, viewsets.ModelViewSet):
 	queryset = HealthService.objects.select_related('child')
 	serializer_class = HealthServiceSerializer
 	model = HealthService
 	permission_classes = [IsAuthenticated, RoleBasedPermission]
+	cache_models = (HealthService, Child)
+
+	@action(detail=False, methods=['post'], url_path='bulk-complete', permission_classes=[IsAuthenticated, BulkChangePermission])
+	def bulk_complete(self, request):
+		serializer = BulkCompleteSerializer(data=request.data)
+		serializer.is_valid(raise_exception=True)
+		completions = serializer.validated_data['services']
+
+		ids = [completion['id'] for completion in completions]
+		services = self.get_queryset().in_bulk(ids)
+		missing = [service_id for service_id in ids if service_id not in services]
+		if missing:
+			raise ValidationError({'services': f'Unknown or inaccessible health service ids: {missing}'})
+
+		# Services already complete are left as they are and reported separately
+		skipped = [service_id for service_id in ids if services[service_id].status == 'complete']
+		try:
+			records = HealthService.objects.bulk_complete(
+				[(services[completion['id']], completion['completed_date']) for completion in completions]
+			)
+		except DjangoValidationError as e:
+			raise ValidationError(e.message_dict)
+
+		return Response({
+			'completed': [service_id for service_id in ids if service_id not in skipped],
+			'skipped': skipped,
+			'immunization_records': ImmunizationRecordSerializer(records, many=True).data
+		})
+
+class DashboardViewSet(RoleBasedQuerySetMixin, viewsets.GenericViewSet):
+	queryset = Child.objects.all()
+	model = Child
+	permission_classes = [IsAuthenticated, RoleBasedPermission]
+
+	@action(detail=False, methods=['get'])
+	def summary(self, request):
+		# Per-child health service counts for the caller's caseload, in one
+		# grouped query; totals are summed from the same rows. due_7/14/30 are
+		# cumulative windows of pending services due from today.
+		today = timezone.now().date()
+		pending = Q(healthservice__status='pending')
+		upcoming = pending & Q(healthservice__due_date__gte=today)
+		counts = {
+			'overdue': Count('healthservice', filter=pending & Q(healthservice__due_date__lt=today)),
+			'due_7': Count('healthservice', filter=upcoming & Q(healthservice__due_date__lte=today + timedelta(days=7))),
+			'due_14': Count('healthservice', filter=upcoming & Q(healthservice__due_date__lte=today + timedelta(days=14))),
+			'due_30': Count('healthservice', filter=upcoming & Q(healthservice__due_date__lte=today + timedelta(days=30))),
+			'completed_this_month': Count('healthservice', filter=Q(
+				healthservice__status='complete', healthservice__completed_date__gte=today.replace(day=1)
+			)),
+		}
+		children = list(
+			self.get_queryset()
+			.annotate(**counts, next_due_date=Min('healthservice__due_date', filter=upcoming))
+			.filter(reduce(operator.or_, (Q(**{f'{name}__gt': 0}) for name in counts)))
+			.order_by('last_name', 'first_name', 'id')
+			.values('id', 'first_name', 'last_name', 'next_due_date', *counts)
+		)
+		totals = {name: sum(child[name] for child in children) for name in counts}
+		return Response({'date': today, 'totals': totals, 'children': children})
 
-class ReminderLogViewSet(RoleBasedQuerySetMixin, viewsets.ModelViewSet):
+class ReminderLogViewSet(SparseFieldsetQuerySetMixin, RoleBasedQuerySetMixin, viewsets.ModelViewSet):
 	queryset = ReminderLog.objects.all()
 	serializer_class = ReminderSerializer
 	model = ReminderLog
+	ordering = ('-id',)
 	permission_classes = [IsAuthenticated, RoleBasedPermission]
 
-class ImmunizationRecordViewset(RoleBasedQuerySetMixin, viewsets.ModelViewSet):
+class ImmunizationRecordViewset(StreamingListMixin, ConditionalGetMixin, SparseFieldsetQuerySetMixin, RoleBasedQuerySetMixin, viewsets.ModelViewSet):
 	queryset = ImmunizationRecord.objects.all()
 	serializer_class = ImmunizationRecordSerializer
 	model = ImmunizationRecord
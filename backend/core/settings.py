@@ -19,12 +19,18 @@ ALLOWED_HOSTS = []
 
 REST_FRAMEWORK = {
 	"DEFAULT_AUTHENTICATION_CLASSES": (
-		"rest_framework_simplejwt.authentication.JWTAuthentication",
+		"c2c.authentication.RoleClaimsJWTAuthentication",
     ),
 	"DEFAULT_PERMISSION_CLASSES": [
 		"rest_framework.permissions.IsAuthenticated",
     ],
 	"DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+	"DEFAULT_RENDERER_CLASSES": [
+		"c2c.renderers.ORJSONRenderer",
+		"rest_framework.renderers.BrowsableAPIRenderer",
+	],
+	"DEFAULT_PAGINATION_CLASS": "c2c.pagination.OrderedCursorPagination",
+	"PAGE_SIZE": 100,
 }
 
 SPECTACULAR_SETTINGS = {
@@ -46,6 +52,8 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    # OpClass index expressions (Child's text_pattern_ops name indexes)
+    'django.contrib.postgres',
 	'rest_framework',
 	'corsheaders',
 	'rest_framework_simplejwt',
@@ -57,6 +65,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
 	'corsheaders.middleware.CorsMiddleware',
+	# Compresses large JSON bodies, streamed list exports included
+	'django.middleware.gzip.GZipMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -100,6 +110,30 @@ DATABASES = {
     }
 }
 
+# Local memory is per process; point both aliases at a shared backend (Redis,
+# Memcached) when running several web workers or a separate qcluster, so
+# signal-driven invalidation reaches every process.
+CACHES = {
+	'default': {
+		'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+	},
+	# Rendered list/detail data for ChildViewSet, CaseViewSet and
+	# HealthServiceViewSet, and the generations that invalidate it. It has to be
+	# shared by every web worker (c2c.W002), so it lives in the database; create
+	# the table with `manage.py createcachetable`, or point it at Redis.
+	'responses': {
+		'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+		'LOCATION': 'c2c_response_cache',
+		'TIMEOUT': 300,
+		'OPTIONS': {'MAX_ENTRIES': 1000, 'CULL_FREQUENCY': 10},
+	},
+}
+
+# Seconds a user's role and accessible child ids stay cached. Entries are
+# cleared on any change to their cases, placements, families or groups, so
+# this only bounds staleness from writes that bypass model signals.
+ACCESS_SCOPE_CACHE_TIMEOUT = 300
+
 Q_CLUSTER = {
 	'name': 'care2connect',
 	'workers': 4,
@@ -110,15 +144,60 @@ Q_CLUSTER = {
 	'orm': 'default',
 }
 
+# Monthly health service generation is split into this many child-id shards,
+# one django-q task each. The coordinating task only queues them, so every
+# worker is free to run one; a result hook logs the combined counts.
+HEALTHSERVICE_SHARDS = Q_CLUSTER['workers']
+
 # Email Config: console outputs to stdout, replace with smtp for production
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+# Reminder delivery: 'batch' sends sequentially, sharing one backend connection
+# per REMINDER_EMAIL_BATCH_SIZE messages. 'async' keeps REMINDER_EMAIL_CONCURRENCY
+# sessions busy in parallel, retrying transient failures with exponential
+# backoff. Both are capped at REMINDER_EMAIL_RATE_LIMIT messages per second
+# (0 = no cap).
+REMINDER_EMAIL_DISPATCH = 'batch'
+REMINDER_EMAIL_BATCH_SIZE = 100
+REMINDER_EMAIL_CONCURRENCY = 4
+REMINDER_EMAIL_RATE_LIMIT = 10
+REMINDER_EMAIL_MAX_RETRIES = 3
+REMINDER_EMAIL_RETRY_BACKOFF = 1.0
+
+# The daily reminder job queues digests in the notification outbox and starts
+# this many drainer tasks; each claims NOTIFICATION_OUTBOX_BATCH_SIZE rows at a time.
+# At most NOTIFICATION_OUTBOX_DRAINERS drain at once (extra ones exit), each at
+# its share of REMINDER_EMAIL_RATE_LIMIT, so that stays the overall cap. A
+# drainer stops claiming after NOTIFICATION_OUTBOX_DRAIN_BUDGET seconds, leaving
+# its last batch room to finish under Q_CLUSTER's timeout, and queues a successor.
+# Claims older than NOTIFICATION_OUTBOX_CLAIM_TIMEOUT belong to a drainer that
+# died mid-batch and go back to pending. A digest that fails to send goes back
+# to pending too, to be claimed again NOTIFICATION_OUTBOX_RETRY_DELAY seconds
+# later (by the 15-minute drainer schedule), until it has been tried
+# NOTIFICATION_OUTBOX_MAX_ATTEMPTS times; then it stays failed.
+NOTIFICATION_OUTBOX_DRAINERS = 2
+NOTIFICATION_OUTBOX_BATCH_SIZE = 50
+NOTIFICATION_OUTBOX_DRAIN_BUDGET = Q_CLUSTER['timeout'] - 90
+NOTIFICATION_OUTBOX_CLAIM_TIMEOUT = Q_CLUSTER['timeout'] * 2
+NOTIFICATION_OUTBOX_MAX_ATTEMPTS = 3
+NOTIFICATION_OUTBOX_RETRY_DELAY = 60 * 60
+
 SIMPLE_JWT = {
 	'ACCESS_TOKEN_LIFETIME': timedelta(minutes=30),
 	'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
 	'TOKEN_OBTAIN_SERIALIZER': 'c2c.serializers.CustomTokenObtainPairSerializer',
+	'TOKEN_REFRESH_SERIALIZER': 'c2c.serializers.CustomTokenRefreshSerializer',
 }
 
+# Access tokens carry role and group claims; read requests authenticate from
+# them without loading the user. With revocation on, a user's outstanding access
+# tokens stop working when their groups change or they are deactivated, and
+# they must refresh. With it off, role changes wait for the next refresh.
+# Revocations live in the default cache, so they only reach every web worker
+# through a shared backend: with LocMemCache they apply solely in the process
+# that made the change (`manage.py check --deploy` warns about this).
+ACCESS_TOKEN_REVOCATION = True
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -18,7 +18,7 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework.routers import DefaultRouter
-from c2c.views import UserViewSet, CaseViewSet, ChildViewSet, FosterFamilyViewSet, FosterPlacementViewSet, HealthServiceViewSet, ReminderLogViewSet, ImmunizationRecordViewset 
+from c2c.views import UserViewSet, CaseViewSet, ChildViewSet, DashboardViewSet, FosterFamilyViewSet, FosterPlacementViewSet, HealthServiceViewSet, ReminderLogViewSet, ImmunizationRecordViewset 
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
 router = DefaultRouter()
@@ -29,6 +29,7 @@ router.register(r'foster-families', FosterFamilyViewSet, basename='fosterfamily'
 router.register(r'foster-placements', FosterPlacementViewSet, basename='fosterplacement')
 router.register(r'health-services', HealthServiceViewSet, basename='healthservice')
 router.register(r'reminders', ReminderLogViewSet, basename='reminderlog')
+router.register(r'dashboard', DashboardViewSet, basename='dashboard')
 router.register(r'immunization-records', ImmunizationRecordViewset, basename='immunizationrecord')
 				
 urlpatterns = [
@@ -13,9 +13,27 @@ api.interceptors.request.use((config) => {
   return config;
 });
 
+// List endpoints are cursor-paginated; follow `next` until every page is loaded.
+const getAllPages = async (url) => {
+  const results = [];
+  let next = url;
+  while (next) {
+    const res = await api.get(next);
+    results.push(...res.data.results);
+    next = res.data.next;
+  }
+  return results;
+};
+
 export const getChildren = async () => {
-  const res = await api.get("/api/children/");
-  return res.data;
+  return getAllPages("/api/children/");
+};
+
+export const searchChildren = async (params) => {
+  const query = new URLSearchParams(
+    Object.entries(params).filter(([, value]) => value),
+  );
+  return getAllPages(`/api/children/?${query}`);
 };
 
 export const getChild = async (id) => {
@@ -35,13 +53,12 @@ export const updateChild = async (id, childData) => {
 };
 
 export const getCases = async () => {
-  const res = await api.get("/api/cases/");
-  return res.data;
+  return getAllPages("/api/cases/?expand=child");
 };
 
 export const getCase = async (id) => {
   if (!id) throw new Error("Case ID is required");
-  const res = await api.get(`/api/cases/${id}/`);
+  const res = await api.get(`/api/cases/${id}/?expand=child`);
   return res.data;
 };
 
@@ -56,8 +73,7 @@ export const updateCase = async (id, caseData) => {
 };
 
 export const getFosterFamilies = async () => {
-  const res = await api.get("/api/foster-families/");
-  return res.data;
+  return getAllPages("/api/foster-families/");
 };
 
 export const getFosterFamily = async (id) => {
@@ -72,8 +88,7 @@ export const createFosterFamily = async (familyData) => {
 };
 
 export const getFosterPlacements = async () => {
-  const res = await api.get("/api/foster-placements/");
-  return res.data;
+  return getAllPages("/api/foster-placements/");
 };
 
 export const getFosterPlacement = async (id) => {
@@ -93,8 +108,7 @@ export const updateFosterPlacement = async (id, placementData) => {
 };
 
 export const getHealthServiceRecords = async () => {
-  const res = await api.get("/api/health-services/");
-  return res.data;
+  return getAllPages("/api/health-services/");
 };
 
 export const getHealthServiceRecord = async (id) => {
@@ -114,8 +128,7 @@ export const updateHealthServiceRecord = async (id, healthServiceData) => {
 };
 
 export const getUsers = async () => {
-  const res = await api.get("/api/users/");
-  return res.data;
+  return getAllPages("/api/users/");
 };
 
 export const getUser = async (id) => {
@@ -125,8 +138,7 @@ export const getUser = async (id) => {
 };
 
 export const getUsersByGroup = async (groupName) => {
-  const res = await api.get(`/api/users/?group=${groupName}`);
-  return res.data;
+  return getAllPages(`/api/users/?group=${groupName}`);
 };
 
 export const createUser = async (userData) => {
@@ -134,33 +146,9 @@ export const createUser = async (userData) => {
   return res.data;
 };
 
-export const getUpcomingHealthServiceRecords = async () => {
-  const allServices = await getHealthServiceRecords();
-  const today = new Date();
-  today.setHours(0, 0, 0, 0);
-  const thirtyDaysFromToday = new Date(
-    today.getTime() + 30 * 24 * 60 * 60 * 1000,
-  );
-
-  return allServices.filter((service) => {
-    const dueDate = new Date(service.due_date);
-    return (
-      service.status === "pending" &&
-      dueDate >= today &&
-      dueDate <= thirtyDaysFromToday
-    );
-  });
-};
-
-export const getOverdueHealthServiceRecords = async () => {
-  const allServices = await getHealthServiceRecords();
-  const today = new Date();
-  today.setHours(0, 0, 0, 0);
-
-  return allServices.filter((service) => {
-    const dueDate = new Date(service.due_date);
-    return service.status === "pending" && dueDate < today;
-  });
+export const getDashboardSummary = async () => {
+  const res = await api.get("/api/dashboard/summary/");
+  return res.data;
 };
 
 export default api;
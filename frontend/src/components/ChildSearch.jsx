@@ -18,7 +18,7 @@ import {
   FormControl,
   InputLabel,
 } from "@mui/material";
-import { getChildren } from "../api";
+import { searchChildren } from "../api";
 
 export default function ChildSearch({
   onSelectChild,
@@ -41,20 +41,10 @@ export default function ChildSearch({
     setError(null);
 
     try {
-      const allChildren = await getChildren();
-
-      const filtered = allChildren.filter((child) => {
-        const firstNameMatch = searchFirstName
-          ? child.first_name
-              .toLowerCase()
-              .includes(searchFirstName.toLowerCase())
-          : true;
-        const lastNameMatch = searchLastName
-          ? child.last_name.toLowerCase().includes(searchLastName.toLowerCase())
-          : true;
-        const dobMatch = searchDOB ? child.dob === searchDOB : true;
-
-        return firstNameMatch && lastNameMatch && dobMatch;
+      const filtered = await searchChildren({
+        first_name: searchFirstName.trim(),
+        last_name: searchLastName.trim(),
+        dob: searchDOB,
       });
 
       setSearchResults(filtered);
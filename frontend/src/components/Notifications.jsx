@@ -8,14 +8,11 @@ import {
   Divider,
   Alert,
 } from "@mui/material";
-import {
-  getUpcomingHealthServiceRecords,
-  getOverdueHealthServiceRecords,
-} from "../api";
+import { getDashboardSummary } from "../api";
 
 export default function Notifications() {
-  const [upcomingServices, setUpcomingServices] = useState([]);
-  const [overdueServices, setOverdueServices] = useState([]);
+  const [upcomingChildren, setUpcomingChildren] = useState([]);
+  const [overdueChildren, setOverdueChildren] = useState([]);
   const [error, setError] = useState(null);
 
   useEffect(() => {
@@ -23,13 +20,10 @@ export default function Notifications() {
       try {
         setError(null);
 
-        const [upcoming, overdue] = await Promise.all([
-          getUpcomingHealthServiceRecords(),
-          getOverdueHealthServiceRecords(),
-        ]);
+        const summary = await getDashboardSummary();
 
-        setUpcomingServices(upcoming);
-        setOverdueServices(overdue);
+        setUpcomingChildren(summary.children.filter((child) => child.due_30 > 0));
+        setOverdueChildren(summary.children.filter((child) => child.overdue > 0));
       } catch (error) {
         setError("Failed to load notifications");
       }
@@ -37,23 +31,7 @@ export default function Notifications() {
     fetchNotifications();
   }, []);
 
-  
-  const formatServiceType = (serviceArray) => {
-    if (!serviceArray || serviceArray.length === 0) return "Service";
-
-    const services = Array.isArray(serviceArray)
-      ? serviceArray
-      : [serviceArray];
-
-    return services
-      .map((service) => {
-        if (service === "well_child") return "Well Child";
-        if (service === "dental") return "Dental";
-        if (service === "immunization(s)") return "Immunization(s)";
-        return service;
-      })
-      .join(", ");
-  };
+  const pluralize = (count) => `${count} service${count === 1 ? "" : "s"}`;
 
   const formatDate = (dateString) => {
     const date = new Date(dateString);
@@ -72,7 +50,7 @@ export default function Notifications() {
 
       {error !== null && <Alert severity="error">{error}</Alert>}
 
-      {overdueServices.length > 0 && (
+      {overdueChildren.length > 0 && (
         <>
           <Typography
             variant="subtitle1"
@@ -83,22 +61,22 @@ export default function Notifications() {
             Past Due
           </Typography>
           <List>
-            {overdueServices.map((service) => (
-              <>
-                <ListItem disablePadding key={service.id}>
+            {overdueChildren.map((child) => (
+              <React.Fragment key={child.id}>
+                <ListItem disablePadding>
                   <ListItemText
-                    primary={`${service.child.last_name}, ${service.child.first_name}`}
-                    secondary={`Due Date: ${service.due_date}`}
+                    primary={`${child.last_name}, ${child.first_name}`}
+                    secondary={`${pluralize(child.overdue)} past due`}
                   />
                 </ListItem>
                 <Divider />
-              </>
+              </React.Fragment>
             ))}
           </List>
         </>
       )}
 
-      {upcomingServices.length > 0 && (
+      {upcomingChildren.length > 0 && (
         <>
           <Typography
             variant="subtitle1"
@@ -109,15 +87,15 @@ export default function Notifications() {
             Upcoming Services
           </Typography>
           <List>
-            {upcomingServices.map((service) => (
-              <React.Fragment key={service.id}>
-                <ListItem disablePadding key={service.id}>
+            {upcomingChildren.map((child) => (
+              <React.Fragment key={child.id}>
+                <ListItem disablePadding>
                   <ListItemText
-                    primary={`${service.child.last_name}, ${service.child.first_name}`}
+                    primary={`${child.last_name}, ${child.first_name}`}
                     secondary={
                       <span sx={{ display: "flex", gap: 1, mt: 0.5 }}>
                         <Typography variant="caption">
-                          {formatServiceType(service.service)} - {formatDate(service.due_date)}
+                          {pluralize(child.due_30)} - next {formatDate(child.next_due_date)}
                         </Typography>
                       </span>
                     }
@@ -130,7 +108,7 @@ export default function Notifications() {
         </>
       )}
 
-      {overdueServices.length === 0 && upcomingServices.length === 0 && (
+      {overdueChildren.length === 0 && upcomingChildren.length === 0 && (
         <Typography
           variant="body2"
           color="text.secondary"
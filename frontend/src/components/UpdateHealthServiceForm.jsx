@@ -42,7 +42,7 @@ export default function UpdateHealthServiceForm({
 
     try {
       const updateData = {
-        child: healthService.child.id,
+        child: healthService.child,
         service: healthService.service,
         immunizations: data.immunizations || [],
         due_date: healthService.due_date,